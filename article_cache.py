@@ -0,0 +1,170 @@
+"""
+on-disk cache of downloaded and parsed articles.
+
+raw html is stored content-addressed (file name = sha256 of the html, gzipped), and
+one small json entry per url holds the validators (ETag / Last-Modified), the hash
+of the html and the parse result. entries younger than `max_age` are served without
+any request, older ones are revalidated with a conditional GET. the least recently
+used entries are evicted once the cache grows beyond `max_bytes`.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from frontier import canonicalize_url
+
+DEFAULT_CACHE_DIR = "data/cache"
+
+
+def _sha256(data: str):
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class ArticleCache:
+    def __init__(
+        self,
+        root: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age: float = 24 * 3600,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.html_dir = os.path.join(root, "html")
+        self.meta_dir = os.path.join(root, "meta")
+        os.makedirs(self.html_dir, exist_ok=True)
+        os.makedirs(self.meta_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(os.path.getsize(path) for path in self._files())
+
+    def _files(self):
+        for folder in (self.html_dir, self.meta_dir):
+            for entry in os.scandir(folder):
+                if entry.is_file():
+                    yield entry.path
+
+    def _meta_path(self, url: str):
+        return os.path.join(self.meta_dir, _sha256(canonicalize_url(url)) + ".json")
+
+    def _html_path(self, html_hash: str):
+        return os.path.join(self.html_dir, html_hash + ".html.gz")
+
+    def _write(self, path: str, data: bytes):
+        """
+        write through a temp file so readers never see a partial file
+        """
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(data) - old_size
+
+    def get(self, url: str):
+        """
+        return the cache entry of a url, or None
+        """
+        path = self._meta_path(url)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # mark as recently used
+        return entry
+
+    def html(self, entry: dict):
+        """
+        return the cached html of an entry, or None if it was evicted
+        """
+        try:
+            with gzip.open(self._html_path(entry["html_hash"]), "rt") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def is_fresh(self, entry: dict):
+        return time.time() - entry["fetched_at"] < self.max_age
+
+    def validators(self, entry: dict):
+        """
+        headers for a conditional GET of a cached page
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, html: str, etag: str = None, last_modified: str = None):
+        """
+        store a freshly downloaded page. the parse result of the previous version is
+        kept only if the html didn't change.
+        """
+        html_hash = _sha256(html)
+        html_path = self._html_path(html_hash)
+        if not os.path.exists(html_path):
+            self._write(html_path, gzip.compress(html.encode("utf-8")))
+        previous = self.get(url)
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "html_hash": html_hash,
+            "fetched_at": time.time(),
+            "parsed": None,
+        }
+        if previous is not None and previous["html_hash"] == html_hash:
+            entry["parsed"] = previous["parsed"]
+        self._save(url, entry)
+        return entry
+
+    def touch(self, entry: dict):
+        """
+        the server confirmed the cached version (304), restart its max_age
+        """
+        entry["fetched_at"] = time.time()
+        self._save(entry["url"], entry)
+
+    def put_parsed(self, url: str, parsed: dict):
+        entry = self.get(url)
+        if entry is None:
+            return
+        entry["parsed"] = parsed
+        self._save(url, entry)
+
+    def _save(self, url: str, entry: dict):
+        self._write(self._meta_path(url), json.dumps(entry).encode("utf-8"))
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        delete least recently used entries until the cache is below 90% of max_bytes
+        """
+        with self._lock:
+            metas = sorted(
+                (e for e in os.scandir(self.meta_dir) if e.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime,
+            )
+            target = self.max_bytes * 0.9
+            for meta in metas:
+                if self._size <= target:
+                    break
+                try:
+                    with open(meta.path, "r") as f:
+                        html_hash = json.load(f)["html_hash"]
+                    html_path = self._html_path(html_hash)
+                    if os.path.exists(html_path):
+                        self._size -= os.path.getsize(html_path)
+                        os.remove(html_path)
+                    self._size -= meta.stat().st_size
+                    os.remove(meta.path)
+                except (OSError, ValueError, KeyError):
+                    continue
@@ -0,0 +1,195 @@
+"""
+tokenize-once corpus encoding.
+
+every article is split into sentences and words once (nltk sent_tokenize and
+word_tokenize, so the tokens are exactly those of word_tokenize(text)), and stored
+as integer ids into one shared vocabulary:
+
+    tokens.u32          token ids of all articles, concatenated (uint32)
+    doc_offsets.npy     start of every article in tokens, plus the end
+    sent_offsets.npy    start of every sentence in tokens, plus the end
+    doc_sentences.npy   index of the first sentence of every article, plus the end
+    lower_ids.npy       id of the lower-cased form of every vocabulary entry
+    is_alpha.npy        str.isalpha() of every vocabulary entry
+    meta.json           vocabulary, number of tokens and hash of the input texts
+
+the arrays are opened memory-mapped and stages that need tokens work on id arrays
+without string processing, e.g. the lower-cased alphabetic tokens of an article are
+
+    ids = enc.lower_ids[enc.doc_tokens(i)]
+    ids = ids[enc.is_alpha[ids]]
+
+load_encoding(texts) hashes the texts to find their encoding; a stage that already
+knows the hash (enc.input_hash of an earlier load) opens it with read_encoding(key)
+without reading or hashing the texts again.
+
+example:
+enc = load_encoding(df["article_text"])
+enc.words(0)[:10], enc.sentence_count(0)
+enc = read_encoding(enc.input_hash)
+"""
+
+import json
+import os
+import shutil
+from functools import cached_property
+
+import numpy as np
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+from count_matrix import prune_cache_dirs, texts_hash
+
+DEFAULT_ENCODING_DIR = "data/encoding"
+TOKEN_DTYPE = np.uint32
+
+
+def tokenize_sentences(text: str):
+    """
+    token lists of the sentences of a text; flattened they equal word_tokenize(text)
+    """
+    return [word_tokenize(sent, preserve_line=True) for sent in sent_tokenize(text)]
+
+
+def encode_corpus(texts, path: str, input_hash: str = None):
+    """
+    tokenize every text once and write the encoding to `path`. tokens are appended
+    to disk article by article, so only the vocabulary and the offsets stay in memory.
+    the previous encoding is replaced only once the new one is complete.
+    """
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    vocabulary = {}
+    doc_offsets, sent_offsets, doc_sentences = [0], [0], [0]
+
+    with open(os.path.join(tmp_path, "tokens.u32"), "wb") as f:
+        for text in texts:
+            text = text if isinstance(text, str) else ""
+            for sentence in tokenize_sentences(text):
+                ids = [vocabulary.setdefault(word, len(vocabulary)) for word in sentence]
+                np.asarray(ids, dtype=TOKEN_DTYPE).tofile(f)
+                sent_offsets.append(sent_offsets[-1] + len(ids))
+            doc_offsets.append(sent_offsets[-1])
+            doc_sentences.append(len(sent_offsets) - 1)
+
+    # lower-cased forms join the vocabulary after the tokens, with new ids
+    for word in list(vocabulary):
+        vocabulary.setdefault(word.lower(), len(vocabulary))
+    words = list(vocabulary)
+    lower_ids = np.array([vocabulary[w.lower()] for w in words], dtype=TOKEN_DTYPE)
+    is_alpha = np.array([w.isalpha() for w in words], dtype=bool)
+
+    arrays = {
+        "doc_offsets": doc_offsets,
+        "sent_offsets": sent_offsets,
+        "doc_sentences": doc_sentences,
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(values, dtype=np.int64))
+    np.save(os.path.join(tmp_path, "lower_ids.npy"), lower_ids)
+    np.save(os.path.join(tmp_path, "is_alpha.npy"), is_alpha)
+    meta = {"input_hash": input_hash, "n_tokens": doc_offsets[-1], "vocabulary": words}
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+class CorpusEncoding:
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.path = path
+        self.input_hash = meta["input_hash"]
+        self.vocabulary = meta["vocabulary"]
+        if meta["n_tokens"]:
+            self.tokens = np.memmap(
+                os.path.join(path, "tokens.u32"),
+                dtype=TOKEN_DTYPE,
+                mode="r",
+                shape=(meta["n_tokens"],),
+            )
+        else:
+            self.tokens = np.zeros(0, dtype=TOKEN_DTYPE)
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        self.doc_offsets = load("doc_offsets")
+        self.sent_offsets = load("sent_offsets")
+        self.doc_sentences = load("doc_sentences")
+        self.lower_ids = load("lower_ids")
+        self.is_alpha = load("is_alpha")
+
+    def __len__(self):
+        return len(self.doc_offsets) - 1
+
+    @cached_property
+    def ids(self):
+        """
+        {word: id} of the vocabulary, built on first use
+        """
+        return {word: i for i, word in enumerate(self.vocabulary)}
+
+    def doc_tokens(self, i: int):
+        """
+        token ids of an article (a view of the memory-mapped file)
+        """
+        return self.tokens[self.doc_offsets[i] : self.doc_offsets[i + 1]]
+
+    def sentence_bounds(self, i: int):
+        """
+        offsets of the sentences of an article within doc_tokens(i), plus the end
+        """
+        bounds = self.sent_offsets[self.doc_sentences[i] : self.doc_sentences[i + 1] + 1]
+        return np.asarray(bounds) - self.doc_offsets[i]
+
+    def token_count(self, i: int):
+        return int(self.doc_offsets[i + 1] - self.doc_offsets[i])
+
+    def sentence_count(self, i: int):
+        return int(self.doc_sentences[i + 1] - self.doc_sentences[i])
+
+    def words(self, i: int):
+        return [self.vocabulary[t] for t in self.doc_tokens(i)]
+
+
+def read_encoding(key: str, root: str = DEFAULT_ENCODING_DIR):
+    """
+    the saved encoding of the texts with hash `key`, or None. the texts are not
+    needed, so nothing is rehashed.
+    """
+    path = os.path.join(root, key[:16])
+    try:
+        encoding = CorpusEncoding(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    if encoding.input_hash != key:
+        return None
+    os.utime(path)
+    return encoding
+
+
+def load_encoding(texts, root: str = DEFAULT_ENCODING_DIR, keep: int = 4):
+    """
+    the saved encoding of the same texts, otherwise encode and save it. encodings
+    live in <root>/<input hash>/ and only the `keep` most recently used are kept.
+    """
+    texts = list(texts)
+    key = texts_hash(texts)
+    encoding = read_encoding(key, root)
+    if encoding is None:
+        path = os.path.join(root, key[:16])
+        encode_corpus(texts, path, key)
+        encoding = CorpusEncoding(path)
+    prune_cache_dirs(root, keep)
+    return encoding
+
+
+# # testing
+# from corpus_store import load_table
+# df = load_table("data/filtered_articles.csv", columns=["article_text"])
+# enc = load_encoding(df["article_text"])
+# print(len(enc), "articles,", len(enc.tokens), "tokens,", len(enc.vocabulary), "types")
+# print(enc.words(0)[:20], enc.sentence_count(0))
@@ -0,0 +1,183 @@
+"""
+columnar corpus store.
+
+every stage table (data/articles.csv, data/cleaned_data.csv, ...) can be saved as a
+parquet dataset under data/store/<name>/, partitioned by publication date and source
+host. readers ask only for the columns they use, so e.g. the zipf analysis reads
+clean_text without parsing the long article_text column, and the files are read
+through memory-mapped arrow buffers.
+
+the csv files stay the exchange format of the notebook: load_table() reads the store
+when it is at least as new as the csv, and falls back to the csv otherwise. the stage
+writers (save_table, task_2.write_rows, task_9.impact2csv) update the store with the
+csv; a csv written by other means is converted with csv_to_store().
+"""
+
+import os
+import shutil
+from urllib.parse import urlparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+PARTITION_COLS = ["pub_date", "source_host"]
+ROW_COL = "__row"
+
+local_fs = pafs.LocalFileSystem(use_mmap=True)
+
+
+def store_path(csv_path: str):
+    """
+    data/articles.csv -> data/store/articles
+    """
+    folder, name = os.path.split(csv_path)
+    return os.path.join(folder, "store", os.path.splitext(name)[0])
+
+
+def store_is_current(csv_path: str):
+    path = store_path(csv_path)
+    if not os.path.isdir(path):
+        return False
+    if not os.path.isfile(csv_path):
+        return True
+    return os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def _partition_values(df: pd.DataFrame):
+    if "date" in df.columns:
+        dates = df["date"].astype(str).str.slice(0, 10)
+        pub_date = dates.where(dates.str.match(r"\d{4}-\d{2}-\d{2}"), "unknown")
+    else:
+        pub_date = pd.Series("unknown", index=df.index)
+    if "source" in df.columns:
+        source_host = df["source"].map(
+            lambda s: urlparse(str(s)).netloc or "unknown"
+        )
+    else:
+        source_host = pd.Series("unknown", index=df.index)
+    return pub_date, source_host
+
+
+def _with_partitions(df: pd.DataFrame, start: int = 0):
+    table_df = df.reset_index(drop=True)
+    pub_date, source_host = _partition_values(table_df)
+    rows = range(start, start + len(table_df))
+    return table_df.assign(
+        **{ROW_COL: rows, "pub_date": pub_date, "source_host": source_host}
+    )
+
+
+def write_store(df: pd.DataFrame, csv_path: str):
+    """
+    save a stage table as a partitioned parquet dataset next to its csv path.
+    the previous dataset is replaced only once the new one is complete.
+    """
+    write_store_chunks([df], csv_path)
+
+
+def write_store_chunks(chunks, csv_path: str):
+    """
+    like write_store() for a table given as an iterable of DataFrames with the same
+    columns, so only one chunk is in memory. the schema is that of the first chunk,
+    columns that are empty in it are stored as strings.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        first = pd.read_csv(csv_path, nrows=0, dtype=str)
+    first = _with_partitions(first)
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(i, field.with_type(pa.string()))
+
+    def to_batches(df):
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False).to_batches()
+
+    def batches():
+        start = len(first)
+        yield from to_batches(first)
+        for df in chunks:
+            df = _with_partitions(df, start)
+            start += len(df)
+            yield from to_batches(df)
+
+    path = store_path(csv_path)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    ds.write_dataset(
+        pa.RecordBatchReader.from_batches(schema, batches()),
+        tmp_path,
+        format="parquet",
+        partitioning=PARTITION_COLS,
+        partitioning_flavor="hive",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    if not os.path.isdir(tmp_path):
+        # no rows, so no partition was written: keep the columns in one empty file
+        os.makedirs(tmp_path)
+        pq.write_table(schema.empty_table(), os.path.join(tmp_path, "part-0.parquet"))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def read_store(csv_path: str, columns: list[str] = None, filter=None):
+    """
+    read a stage table from the store. only `columns` are read (all if None), and
+    `filter` is an optional pyarrow expression, e.g. ds.field("pub_date") >= "2025-10-28",
+    that also skips whole partitions.
+    """
+    dataset = ds.dataset(
+        store_path(csv_path),
+        format="parquet",
+        partitioning="hive",
+        filesystem=local_fs,
+    )
+    if columns is None:
+        columns = [
+            c for c in dataset.schema.names if c not in PARTITION_COLS + [ROW_COL]
+        ]
+    table = dataset.to_table(columns=list(columns) + [ROW_COL], filter=filter)
+    df = table.to_pandas().sort_values(ROW_COL)
+    return df.drop(columns=ROW_COL).reset_index(drop=True)
+
+
+def load_table(csv_path: str, columns: list[str] = None):
+    """
+    read a stage table with only the columns a stage uses, from the store when it is
+    up to date, otherwise from the csv
+    """
+    if store_is_current(csv_path):
+        return read_store(csv_path, columns)
+    df = pd.read_csv(csv_path, usecols=columns)
+    return df if columns is None else df[list(columns)]
+
+
+def save_table(df: pd.DataFrame, csv_path: str):
+    """
+    save a stage table as csv and to the store
+    """
+    df.to_csv(csv_path, index=False)
+    write_store(df, csv_path)
+
+
+def csv_to_store(csv_path: str, chunk_size: int = None):
+    """
+    convert an existing csv stage table. with `chunk_size` the csv is read in chunks
+    of that many rows with every column as strings, so memory use doesn't depend on
+    the size of the table.
+    """
+    if chunk_size is None:
+        write_store(pd.read_csv(csv_path), csv_path)
+    else:
+        chunks = pd.read_csv(csv_path, chunksize=chunk_size, dtype=str)
+        write_store_chunks(chunks, csv_path)
+
+
+# # testing
+# for name in ["articles", "cleaned_data", "filtered_articles", "articles_top_keywords"]:
+#     csv_to_store(f"data/{name}.csv")
+# print(load_table("data/filtered_articles.csv", columns=["clean_text"]).head())
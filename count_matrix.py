@@ -0,0 +1,184 @@
+"""
+persisted term-count matrix of the clean_text column.
+
+the corpus is tokenized and counted once with CountVectorizer, and tf-idf is derived
+from the counts with TfidfTransformer (TfidfVectorizer is exactly these two steps).
+the sparse counts are saved as .npz with the vocabulary as json in a directory named
+after a hash of the texts and the vectorizer settings, so later runs and other
+consumers load them instead of vectorizing again.
+
+example:
+counts, vocabulary = load_counts(df["clean_text"])
+tfidf = counts_to_tfidf(counts)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+
+DEFAULT_CACHE_DIR = "data/keyword_cache"
+
+
+def texts_hash(texts, max_features: int = None):
+    h = hashlib.sha256(f"max_features={max_features}".encode("utf-8"))
+    for text in texts:
+        h.update(b"\0")
+        h.update(str(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+def prune_cache_dirs(root: str, keep: int):
+    """
+    remove all but the `keep` most recently used (touched) subdirectories of root
+    """
+    entries = sorted(
+        (e for e in os.scandir(root) if e.is_dir()),
+        key=lambda e: e.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in entries[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _paths(cache_dir: str, key: str):
+    base = os.path.join(cache_dir, key[:16])
+    return base, os.path.join(base, "counts.npz"), os.path.join(base, "vocabulary.json")
+
+
+def save_counts(counts, vocabulary, key: str, cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    write the matrix and the vocabulary through temp files, vocabulary last: it
+    carries the input hash, so a partial write is never mistaken for a valid cache
+    """
+    base, npz_path, vocab_path = _paths(cache_dir, key)
+    os.makedirs(base, exist_ok=True)
+    tmp_npz = f"{npz_path}.tmp.npz"
+    sp.save_npz(tmp_npz, counts.tocsr())
+    os.replace(tmp_npz, npz_path)
+    tmp_vocab = f"{vocab_path}.tmp"
+    with open(tmp_vocab, "w") as f:
+        json.dump({"input_hash": key, "vocabulary": list(vocabulary)}, f)
+    os.replace(tmp_vocab, vocab_path)
+
+
+def read_counts(key: str, cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    the cached (counts, vocabulary) of the input with hash `key`, or None
+    """
+    base, npz_path, vocab_path = _paths(cache_dir, key)
+    try:
+        with open(vocab_path, "r") as f:
+            meta = json.load(f)
+        if meta["input_hash"] != key:
+            return None
+        counts = sp.load_npz(npz_path).tocsr()
+    except (OSError, ValueError, KeyError):
+        return None
+    vocabulary = np.array(meta["vocabulary"], dtype=object)
+    if counts.shape[1] != len(vocabulary):
+        return None
+    os.utime(base)
+    return counts, vocabulary
+
+
+def load_counts(
+    texts, max_features: int = 2000, cache_dir: str = DEFAULT_CACHE_DIR, keep: int = 4
+):
+    """
+    (csr count matrix, vocabulary array) of the texts, from the cache when the
+    texts are unchanged, otherwise vectorized once and cached. every input (texts
+    and max_features) has its own <cache_dir>/<input hash>/ and only the `keep` most
+    recently used are kept, so tables used in turn don't evict each other.
+    """
+    texts = list(texts)
+    key = texts_hash(texts, max_features)
+    cached = read_counts(key, cache_dir)
+    if cached is None:
+        cv = CountVectorizer(max_features=max_features)
+        counts = cv.fit_transform(texts).tocsr()
+        vocabulary = cv.get_feature_names_out()
+        save_counts(counts, vocabulary, key, cache_dir)
+        cached = counts, vocabulary
+    prune_cache_dirs(cache_dir, keep)
+    return cached
+
+
+def counts_to_tfidf(counts):
+    """
+    same matrix as TfidfVectorizer with default settings on the same texts
+    """
+    return TfidfTransformer().fit_transform(counts).tocsr()
+
+
+def top_k_per_row(matrix, k: int = 5, block_cells: int = 1 << 22):
+    """
+    (rows, columns) of the k largest positive entries of every row of a csr matrix,
+    ordered by row and by decreasing value within a row (ties by column).
+    works on the csr arrays only: the non-zeros of a block of rows are laid out in a
+    (rows, longest row) array padded with -inf, a partition finds the k-th largest
+    value of every row and only the k picked entries are sorted. entries tied with
+    the k-th value are picked by lowest column, so the result is deterministic.
+    blocks hold about `block_cells` values.
+    """
+    matrix = matrix.tocsr()
+    if not matrix.has_sorted_indices:
+        matrix = matrix.sorted_indices()
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data
+    lengths = np.diff(indptr)
+    n_rows = matrix.shape[0]
+    block = max(1, block_cells // max(int(lengths.max(initial=0)), 1))
+    found_rows, found_cols = [], []
+
+    for start in range(0, n_rows, block):
+        stop = min(start + block, n_rows)
+        lens = lengths[start:stop]
+        width = int(lens.max(initial=0))
+        if width == 0:
+            continue
+        first, last = indptr[start], indptr[stop]
+        local_rows = np.repeat(np.arange(stop - start), lens)
+        offsets = np.arange(last - first) - (indptr[start:stop] - first)[local_rows]
+        padded = np.full((stop - start, width), -np.inf)
+        padded[local_rows, offsets] = data[first:last]
+
+        if width > k:
+            # everything above the k-th value, then the leftmost (lowest column)
+            # entries equal to it; columns increase along a row as indices are sorted
+            kth = -np.partition(-padded, k - 1, axis=1)[:, k - 1 : k]
+            above = padded > kth
+            tied = padded == kth
+            needed = k - above.sum(axis=1, keepdims=True)
+            selected = above | (tied & (np.cumsum(tied, axis=1) <= needed))
+            picked = np.nonzero(selected)[1].reshape(-1, k)
+        else:
+            picked = np.broadcast_to(np.arange(width), padded.shape)
+        values = np.take_along_axis(padded, picked, axis=1)
+        positions = np.minimum(indptr[start:stop, None] + picked, len(indices) - 1)
+        cols = np.where(picked < lens[:, None], indices[positions], -1)
+
+        order = np.lexsort((cols, -values), axis=-1)
+        values = np.take_along_axis(values, order, axis=1)
+        cols = np.take_along_axis(cols, order, axis=1)
+        rows = np.broadcast_to(np.arange(start, stop)[:, None], values.shape)
+        keep = values > 0
+        found_rows.append(rows[keep])
+        found_cols.append(cols[keep])
+
+    if not found_rows:
+        return np.array([], dtype=np.int64), np.array([], dtype=indices.dtype)
+    return np.concatenate(found_rows), np.concatenate(found_cols)
+
+
+def top_terms_per_row(matrix, vocabulary, k: int = 5, sep: str = ", "):
+    """
+    the k best terms of every row joined into a string, "" for empty rows
+    """
+    rows, columns = top_k_per_row(matrix, k)
+    terms = np.asarray(vocabulary, dtype=object)[columns]
+    bounds = np.searchsorted(rows, np.arange(matrix.shape[0] + 1))
+    return [sep.join(terms[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,172 @@
+"""
+persistent url frontier backed by sqlite.
+
+urls are stored once under their canonical form (lower-cased host, no fragment,
+no tracking parameters) together with their crawl status, last fetch time and
+retry count, so re-runs only touch urls that still need work.
+
+example:
+with URLFrontier() as frontier:
+    frontier.add_urls(urls)
+    get_articles(frontier.pending_urls(), query_words, frontier=frontier)
+"""
+
+import csv
+import os
+import sqlite3
+import time
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+DEFAULT_FRONTIER_PATH = "data/frontier.sqlite"
+
+PENDING = "pending"
+FETCHED = "fetched"
+FAILED = "failed"
+IRRELEVANT = "irrelevant"
+
+TRACKING_PREFIXES = ("utm_", "mc_", "pk_")
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "cmpid",
+    "ncid",
+    "ref",
+    "ref_src",
+    "src",
+    "soc_src",
+    "soc_trk",
+    "taid",
+    "at_medium",
+    "at_campaign",
+    "ito",
+    "ocid",
+    "guccounter",
+}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str):
+    """
+    normalize a url so that the same article reached through different links
+    gets the same key
+    """
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS
+        and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunparse((scheme, host, path, "", urlencode(sorted(query)), ""))
+
+
+class URLFrontier:
+    def __init__(self, path: str = DEFAULT_FRONTIER_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                canonical TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                added REAL NOT NULL,
+                last_fetch REAL,
+                retries INTEGER NOT NULL DEFAULT 0,
+                error TEXT
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON urls(status)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def add_urls(self, urls: list[str]):
+        """
+        insert urls not seen before, return the number of new urls
+        """
+        now = time.time()
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO urls (canonical, url, added) VALUES (?, ?, ?)",
+            ((canonicalize_url(url), url.strip(), now) for url in urls),
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def import_csv(self, path: str = "data/articles_urls.csv"):
+        """
+        load urls from the old articles_urls.csv file
+        """
+        if not os.path.isfile(path):
+            return 0
+        with open(path, "r", newline="") as csvfile:
+            reader = csv.reader(csvfile)
+            next(reader, None)
+            return self.add_urls([row[0] for row in reader if row])
+
+    def mark(self, url: str, status: str, error: str = None):
+        """
+        record the outcome of a fetch. failures increase the retry count.
+        """
+        self.conn.execute(
+            """
+            UPDATE urls SET status = ?, last_fetch = ?, error = ?,
+                retries = retries + (? = 'failed')
+            WHERE canonical = ?
+            """,
+            (status, time.time(), error, status, canonicalize_url(url)),
+        )
+        self.conn.commit()
+
+    def pending_urls(
+        self,
+        limit: int = None,
+        max_retries: int = 3,
+        retry_after: float = 3600,
+        retry_irrelevant: bool = False,
+    ):
+        """
+        return urls that still need work: never fetched, failed less than
+        `max_retries` times and not retried in the last `retry_after` seconds,
+        and (with retry_irrelevant=True, e.g. for a new query) irrelevant ones.
+        """
+        statuses = [PENDING, IRRELEVANT] if retry_irrelevant else [PENDING]
+        rows = self.conn.execute(
+            f"""
+            SELECT url FROM urls
+            WHERE status IN ({",".join("?" * len(statuses))})
+               OR (status = 'failed' AND retries < ? AND last_fetch < ?)
+            ORDER BY added
+            LIMIT ?
+            """,
+            (*statuses, max_retries, time.time() - retry_after, limit or -1),
+        )
+        return [row[0] for row in rows]
+
+    def counts(self):
+        """
+        number of urls per status
+        """
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status")
+        return dict(rows.fetchall())
@@ -0,0 +1,140 @@
+"""
+streaming keyword statistics with fixed memory.
+
+articles are added as they arrive, without a refit and without a vocabulary:
+- document frequencies live in a fixed array indexed by the HashingVectorizer
+  hash of a term (same tokenization as CountVectorizer),
+- total term counts are kept the same way, and the names of the frequent terms
+  are tracked by a space-saving sketch of `capacity` terms. a monitored term's count
+  is never under-estimated, and it is over-estimated by at most the `error`
+  recorded when the term entered the sketch.
+
+top_terms() answers "top n terms by count / tf-idf so far" at any moment. the tf-idf
+score is count * idf with the smoothed idf of TfidfTransformer, computed from the
+current document frequencies.
+
+example:
+stats = StreamingKeywordStats()
+stats.update(df["clean_text"])
+print(stats.top_terms(20, by="tfidf"))
+"""
+
+import heapq
+from collections import Counter
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+
+class SpaceSaving:
+    """
+    space-saving heavy hitters over weighted updates. when a new term arrives and
+    the sketch is full, the term with the smallest count is replaced and the new
+    term inherits that count as its error. the heap holds (count, term) entries and
+    is cleaned lazily: an entry is stale if the term's count has changed since.
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.heap = []
+
+    def update(self, term: str, weight: int = 1):
+        if term in self.counts:
+            self.counts[term] += weight
+        elif len(self.counts) < self.capacity:
+            self.counts[term] = weight
+            self.errors[term] = 0
+        else:
+            min_count, min_term = self._pop_min()
+            del self.counts[min_term], self.errors[min_term]
+            self.counts[term] = min_count + weight
+            self.errors[term] = min_count
+        heapq.heappush(self.heap, (self.counts[term], term))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [(count, term) for term, count in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def _pop_min(self):
+        while True:
+            count, term = heapq.heappop(self.heap)
+            if self.counts.get(term) == count:
+                return count, term
+
+    def top(self, n: int):
+        """
+        [(term, count, error)] of the n largest counts
+        """
+        best = heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+        return [(term, count, self.errors[term]) for term, count in best]
+
+
+class StreamingKeywordStats:
+    def __init__(self, n_features: int = 2**20, capacity: int = 10_000):
+        self.n_features = n_features
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features, alternate_sign=False, norm=None
+        )
+        self.analyzer = self.vectorizer.build_analyzer()
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.term_totals = np.zeros(n_features, dtype=np.int64)
+        self.heavy_hitters = SpaceSaving(capacity)
+        self.n_docs = 0
+
+    def update(self, texts):
+        """
+        add a batch of articles (any iterable of strings)
+        """
+        texts = [str(text) for text in texts]
+        if not texts:
+            return
+        counts = self.vectorizer.transform(texts).tocsr()
+        np.add.at(self.doc_freq, counts.indices, 1)
+        np.add.at(self.term_totals, counts.indices, counts.data.astype(np.int64))
+        self.n_docs += len(texts)
+        for text in texts:
+            for term, count in Counter(self.analyzer(text)).items():
+                self.heavy_hitters.update(term, count)
+
+    def _column(self, term: str):
+        return abs(murmurhash3_32(term, seed=0)) % self.n_features
+
+    def count(self, term: str, estimate: int = None):
+        """
+        total count of a term. the hashed total and the sketch estimate can only
+        over-count (collisions, evictions), so the smaller one is used
+        """
+        total = int(self.term_totals[self._column(term)])
+        return total if estimate is None else min(total, estimate)
+
+    def idf(self, term: str):
+        """
+        smoothed idf, as TfidfTransformer(smooth_idf=True)
+        """
+        df = self.doc_freq[self._column(term)]
+        return np.log((1 + self.n_docs) / (1 + df)) + 1
+
+    def top_terms(self, n: int = 20, by: str = "count"):
+        """
+        [(term, score)] of the n best terms so far, by total count or by count * idf.
+        candidates are the terms monitored by the heavy-hitters sketch.
+        """
+        if by not in ("count", "tfidf"):
+            raise ValueError(f"unknown ranking {by!r}, expected 'count' or 'tfidf'")
+        candidates = self.heavy_hitters.top(self.heavy_hitters.capacity)
+        scored = []
+        for term, estimate, _ in candidates:
+            count = self.count(term, estimate)
+            scored.append((term, count if by == "count" else count * self.idf(term)))
+        return heapq.nlargest(n, scored, key=lambda item: item[1])
+
+
+# # testing
+# import pandas as pd
+# stats = StreamingKeywordStats()
+# for chunk in pd.read_csv("data/filtered_articles.csv", chunksize=10):
+#     stats.update(chunk["clean_text"])
+#     print(stats.n_docs, stats.top_terms(5))
+# print(stats.top_terms(20, by="tfidf"))
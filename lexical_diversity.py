@@ -0,0 +1,112 @@
+"""
+lexical diversity (ttr, msttr, mattr) over integer token ids with numpy.
+
+everything is derived from one array: prev[j], the position of the previous
+occurrence of token j's type in the same document (-1 if none). a token starts a new
+type in a span beginning at `start` exactly when prev[j] < start, so
+- ttr counts the tokens with prev < document start,
+- msttr counts, per full segment of `window` tokens, those with prev < segment start,
+- mattr slides the window one token at a time: from window s to s + 1 the type of
+  token s is lost if it has no later occurrence inside the window (next[s] >= s + w)
+  and the type of token s + w is new if prev[s + w] <= s, so all window counts follow
+  from the first one with a cumulative sum, in O(n) instead of O(n * window).
+
+a batch of documents is passed as the concatenated ids plus offsets (as stored by
+corpus_encoding), and all metrics of all documents come out of one call. like
+task_6, values are percentages, and msttr / mattr fall back to ttr for documents
+shorter than the window.
+
+example:
+metrics = diversity_batch(ids, offsets, window=100)
+metrics["mattr"][0]
+"""
+
+import numpy as np
+
+
+def previous_occurrence(ids: np.ndarray, doc_of: np.ndarray):
+    """
+    prev and next occurrence of every token's type within its document (-1 / n if none)
+    """
+    n = len(ids)
+    keys = doc_of.astype(np.int64) * (int(ids.max(initial=0)) + 1) + ids
+    order = np.argsort(keys, kind="stable")
+    same = keys[order[1:]] == keys[order[:-1]]
+    prev = np.full(n, -1, dtype=np.int64)
+    nxt = np.full(n, n, dtype=np.int64)
+    prev[order[1:][same]] = order[:-1][same]
+    nxt[order[:-1][same]] = order[1:][same]
+    return prev, nxt
+
+
+def diversity_batch(ids, offsets, window: int = 100):
+    """
+    {"ttr", "msttr", "mattr", "n_tokens"} arrays, one value per document, for the
+    token ids of documents i at ids[offsets[i]:offsets[i + 1]]
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_docs = len(offsets) - 1
+    lengths = np.diff(offsets)
+    doc_of = np.repeat(np.arange(n_docs), lengths)
+    positions = np.arange(len(ids))
+    starts = offsets[:-1][doc_of]
+    prev, nxt = previous_occurrence(ids, doc_of)
+
+    def per_doc(mask, weights=None):
+        w = mask if weights is None else np.where(mask, weights, 0)
+        return np.bincount(doc_of, weights=w, minlength=n_docs).astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # TTR
+        types = per_doc(prev < starts)
+        ttr = np.where(lengths > 0, types / lengths * 100, 0.0)
+
+        # MSTTR over the full segments only
+        rel = positions - starts
+        segment_start = starts + rel // window * window
+        n_segments = lengths // window
+        in_full = rel < n_segments[doc_of] * window
+        segment_types = per_doc(in_full & (prev < segment_start))
+        msttr = segment_types / (n_segments * window) * 100
+
+        # MATTR: first window, then the change from window s to s + 1
+        ends = offsets[1:][doc_of]
+        first_types = per_doc((rel < window) & (prev < starts))
+        has_step = positions + window < ends
+        entering = np.minimum(positions + window, len(ids) - 1)
+        delta = (prev[entering] <= positions).astype(np.int64) - (nxt >= positions + window)
+        # window s counts first_types + delta[start .. s-1], so the sum over all
+        # windows weights delta[t] by the number of windows after t
+        windows_after = ends - window - positions
+        n_windows = np.maximum(lengths - window + 1, 0)
+        window_types = n_windows * first_types + per_doc(has_step, delta * windows_after)
+        mattr = window_types / (n_windows * window) * 100
+
+    short = lengths < window
+    msttr = np.where(short, ttr, msttr)
+    mattr = np.where(short, ttr, mattr)
+    return {"ttr": ttr, "msttr": msttr, "mattr": mattr, "n_tokens": lengths}
+
+
+def ttr(ids):
+    return float(diversity_batch(ids, [0, len(ids)])["ttr"][0])
+
+
+def msttr(ids, window: int = 100):
+    return float(diversity_batch(ids, [0, len(ids)], window)["msttr"][0])
+
+
+def mattr(ids, window: int = 100):
+    return float(diversity_batch(ids, [0, len(ids)], window)["mattr"][0])
+
+
+def diversity_from_encoding(encoding, window: int = 100):
+    """
+    metrics of every article of a corpus_encoding.CorpusEncoding, on its
+    lower-cased alphabetic tokens (the tokens task_6 counts)
+    """
+    ids = encoding.lower_ids[encoding.tokens]
+    alpha = encoding.is_alpha[ids]
+    kept = np.concatenate([[0], np.cumsum(alpha)])
+    return diversity_batch(ids[alpha], kept[encoding.doc_offsets], window)
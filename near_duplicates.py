@@ -0,0 +1,150 @@
+"""
+near-duplicate detection for syndicated articles.
+
+every text is turned into a set of word shingles (k consecutive words), summarized
+by a minhash signature, and indexed with lsh banding: signatures are cut into bands
+and two texts become candidates only if one of their bands is identical. candidates
+are confirmed with the jaccard similarity estimated from the signatures. each text is
+compared only against the texts sharing a bucket with it, so the cost grows roughly
+linearly with the number of texts instead of with all pairs.
+
+example:
+clusters = find_near_duplicates(df["article_text"], threshold=0.8)
+"""
+
+import re
+import zlib
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, k: int = 5):
+    """
+    set of k-word shingles of a text, lower-cased
+    """
+    words = WORD_PATTERN.findall(str(text).lower())
+    if len(words) <= k:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + k]) for i in range(len(words) - k + 1)}
+
+
+def optimal_bands(threshold: float, num_perm: int):
+    """
+    (bands, rows) with bands * rows <= num_perm whose s-curve midpoint
+    (1 / bands) ** (1 / rows) is closest to the threshold
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.randint(1, 1 << 61, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 61, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str):
+        """
+        minhash signature of the shingle set of a text, one minimum per permutation
+        """
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(
+            (zlib.crc32(g.encode("utf-8")) for g in grams),
+            dtype=np.uint64,
+            count=len(grams),
+        )
+        permuted = (hashes[:, None] * self.a + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+
+def estimated_jaccard(sig1: np.ndarray, sig2: np.ndarray):
+    return float(np.mean(sig1 == sig2))
+
+
+class LSHIndex:
+    """
+    banded lsh index over minhash signatures. texts can be added one at a time,
+    memory holds the band keys and the signatures of the indexed texts only.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128):
+        self.threshold = threshold
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        self.tables = [{} for _ in range(self.bands)]
+        self.signatures = {}
+
+    def _band_keys(self, sig: np.ndarray):
+        r = self.rows
+        return [sig[i * r : (i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def candidates(self, sig: np.ndarray):
+        found = set()
+        for table, key in zip(self.tables, self._band_keys(sig)):
+            found.update(table.get(key, ()))
+        return found
+
+    def insert(self, key, sig: np.ndarray):
+        self.signatures[key] = sig
+        for table, band_key in zip(self.tables, self._band_keys(sig)):
+            table.setdefault(band_key, []).append(key)
+
+    def find_duplicate(self, sig: np.ndarray):
+        """
+        key of the most similar indexed text with estimated jaccard >= threshold, or None
+        """
+        best_key, best_sim = None, self.threshold
+        for key in self.candidates(sig):
+            sim = estimated_jaccard(sig, self.signatures[key])
+            if sim >= best_sim:
+                best_key, best_sim = key, sim
+        return best_key
+
+
+class NearDuplicateClusters:
+    """
+    streaming clustering: texts are assigned one at a time, so a corpus can be
+    processed in chunks. the first text of a cluster is its canonical article.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 5):
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.index = LSHIndex(threshold, num_perm)
+
+    def assign(self, key, text: str):
+        """
+        key of the canonical article of the text's cluster (its own key if it is new)
+        """
+        sig = self.hasher.signature(text)
+        canonical = self.index.find_duplicate(sig)
+        if canonical is None:
+            self.index.insert(key, sig)
+            canonical = key
+        return canonical
+
+
+def find_near_duplicates(
+    texts,
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    shingle_size: int = 5,
+    keys=None,
+):
+    """
+    assign every text to a cluster of near-duplicates. the result holds, for every
+    text, the key of its canonical article. keys default to positions.
+    """
+    clusters = NearDuplicateClusters(threshold, num_perm, shingle_size)
+    keys = range(len(texts)) if keys is None else keys
+    return [clusters.assign(key, text) for key, text in zip(keys, texts)]
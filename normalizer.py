@@ -0,0 +1,78 @@
+"""
+shared token normalization: stopword filtering and wordnet lemmatization.
+
+stopwords are kept in a frozenset for constant-time membership, and lemmas are
+memoized per (word, wordnet pos) in a bounded lru cache. news vocabulary follows
+zipf's law, so a few thousand pairs cover most tokens and nearly every lookup is a
+cache hit. one module-level instance is shared by every stage that lemmatizes.
+
+example:
+from normalizer import normalizer
+normalizer.lemmatize("storms", "n")
+print(normalizer.stats())
+"""
+
+from functools import cached_property, lru_cache
+import nltk
+from nltk.corpus import stopwords
+
+
+# wordnet pos constants (wn.ADJ, wn.NOUN, wn.ADV, wn.VERB) by first letter of the
+# penn treebank tag, as plain strings so the lookup doesn't go through the lazy corpus
+WN_POS = {"J": "a", "N": "n", "R": "r", "V": "v"}
+
+
+def penn_to_wn_tag(tag: str):
+    return WN_POS.get(tag[:1], "n")
+
+
+class Normalizer:
+    def __init__(self, max_size: int = 100_000, language: str = "english"):
+        self.language = language
+        self.wnl = nltk.WordNetLemmatizer()
+        self.lemmatize = lru_cache(maxsize=max_size)(self._lemmatize)
+
+    @cached_property
+    def stopwords(self):
+        return frozenset(stopwords.words(self.language))
+
+    def _lemmatize(self, word: str, pos: str = "n"):
+        return self.wnl.lemmatize(word, pos=pos)
+
+    def is_content_word(self, word: str):
+        """
+        alphabetic and not a stopword
+        """
+        return word.isalpha() and word not in self.stopwords
+
+    def normalize(self, tagged_tokens: list[tuple[str, str]]):
+        """
+        lemmas of the content words of (token, penn tag) pairs
+        """
+        stopwords = self.stopwords
+        lemmatize = self.lemmatize
+        return [
+            lemmatize(word, penn_to_wn_tag(tag))
+            for word, tag in tagged_tokens
+            if word.isalpha() and word not in stopwords
+        ]
+
+    def stats(self):
+        """
+        hit rate of the lemma memo
+        """
+        info = self.lemmatize.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+
+    def clear(self):
+        self.lemmatize.cache_clear()
+
+
+normalizer = Normalizer()
@@ -0,0 +1,125 @@
+"""
+match articles against many standing queries in one pass.
+
+every query is a named list of terms (for example {"melissa": ["hurricane", "melissa"],
+"kalmaegi": ["typhoon", "kalmaegi"]}), a query matches an article when all of its
+terms occur. all terms of all queries are compiled into one aho-corasick automaton
+over word tokens, so the cost of matching depends on the length of the article and
+not on the number of queries.
+
+a term can be a phrase ("hurricane melissa"): in a text its words must follow each
+other, among the article keywords (single words, as newspaper extracts them) all of
+its words must be keywords.
+"""
+
+from collections import Counter, deque
+from functools import lru_cache
+from itertools import product
+from normalizer import normalizer
+
+
+@lru_cache(maxsize=100_000)
+def word_forms(word: str):
+    """
+    the word with its noun and verb lemmas, so "storms" matches "storm". without the
+    wordnet corpus the word only matches itself
+    """
+    lemmatize = normalizer.lemmatize
+    try:
+        return frozenset((word, lemmatize(word, "n"), lemmatize(word, "v")))
+    except LookupError:
+        return frozenset((word,))
+
+
+class QueryAutomaton:
+    def __init__(self, queries: dict[str, list[str]]):
+        self.queries = queries
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        self.keyword_terms = {}
+        self.term_size = {}
+        self.term_count = {}
+        for name, terms in queries.items():
+            terms = {tuple(term.lower().split()) for term in terms}
+            self.term_count[name] = len(terms)
+            for words in terms:
+                label = (name, words)
+                self.term_size[label] = len(set(words))
+                for word in set(words):
+                    self.keyword_terms.setdefault(word, set()).add(label)
+                # a text word matches a query word if they share a lemma
+                for variant in product(*[sorted(word_forms(w)) for w in words]):
+                    self._add(variant, label)
+        self._build()
+
+    def _add(self, words: tuple, label: tuple):
+        state = 0
+        for word in words:
+            if word not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(set())
+                self.goto[state][word] = len(self.goto) - 1
+            state = self.goto[state][word]
+        self.out[state].add(label)
+
+    def _build(self):
+        """
+        breadth-first pass setting the failure links and merging outputs along them
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(word, 0)
+                self.out[child] |= self.out[self.fail[child]]
+
+    def _step(self, state: int, word: str):
+        while state and word not in self.goto[state]:
+            state = self.fail[state]
+        return self.goto[state].get(word, 0)
+
+    def _complete(self, hits: set):
+        """
+        queries with all their terms hit; a query without terms matches everything,
+        like task_1.is_relevant() with an empty query
+        """
+        found = {name: 0 for name, n in self.term_count.items() if n == 0}
+        for name, _ in hits:
+            found[name] = found.get(name, 0) + 1
+        return {name for name, n in found.items() if n == self.term_count[name]}
+
+    def matching_queries(self, *texts: list[str]):
+        """
+        names of the queries whose terms (or their lemmas) all occur in the given
+        word lists, e.g. the split title and body of an article
+        """
+        hits = set()
+        for words in texts:
+            states = {0}
+            for word in words:
+                next_states = set()
+                for form in word_forms(word):
+                    for state in states:
+                        next_state = self._step(state, form)
+                        next_states.add(next_state)
+                        hits |= self.out[next_state]
+                states = next_states
+        return self._complete(hits)
+
+    def relevant_queries(self, keywords: list[str]):
+        """
+        names of the queries whose terms are all among the article keywords,
+        the multi-query version of task_1.is_relevant(). a phrase term is hit when
+        every one of its words is a keyword.
+        """
+        seen = Counter()
+        for keyword in {keyword.lower() for keyword in keywords}:
+            seen.update(self.keyword_terms.get(keyword, ()))
+        hits = {label for label, n in seen.items() if n == self.term_size[label]}
+        return self._complete(hits)
@@ -0,0 +1,176 @@
+"""
+flesch reading ease and gunning fog in one pass per document.
+
+textstat recomputes the word list, the sentence count and the syllables of every
+word for each score it is asked for. here a text is split once, the counts both
+scores depend on (words, sentences, syllables, complex words) are collected
+together, and syllable counts come from a table shared by all documents. news
+vocabulary repeats a lot, so after the first articles almost every word is a hit.
+
+the rules are those of textstat 0.7.10 (the pinned version) for english:
+- words: punctuation removed except apostrophes of contractions, split on spaces
+- sentences: regex r"\\b[^.!?]+[.!?]*", pieces of 2 words or less not counted (min 1)
+- syllables: cmudict vowel count, pyphen hyphenation points + 1 for unknown words
+- complex words (fog): not in the dale-chall easy words, 3 syllables or more
+so the scores agree with textstat up to float rounding: TOLERANCE is the documented
+maximum absolute difference, checked by compare_with_textstat(). if the cmudict
+corpus can't be loaded every word is counted with pyphen, textstat itself fails
+in that case, and flesch can then move by a few points on long articles.
+
+example:
+scores = readability_batch(df, "article_text")
+"""
+
+import importlib.resources
+import re
+from functools import lru_cache
+
+import nltk
+import pandas as pd
+import textstat
+from pyphen import Pyphen
+
+TOLERANCE = 1e-9
+FRE_BASE, FRE_SENTENCE_LENGTH, FRE_SYLL_PER_WORD = 206.835, 1.015, 84.6
+COMPLEX_SYLLABLES = 3
+
+NONCONTRACTION_APOSTROPHE = re.compile(r"\'(?!(?:[tsd]|ve|ll|re))")
+PUNCTUATION = re.compile(r"[^\w\s\']")
+SENTENCE = re.compile(r"\b[^.!?]+[.!?]*", re.UNICODE)
+
+_pyphen = Pyphen(lang="en_US")
+
+
+@lru_cache(maxsize=1)
+def cmudict():
+    try:
+        nltk.download("cmudict", quiet=True)
+        return nltk.corpus.cmudict.dict()
+    except LookupError:
+        return {}
+
+
+@lru_cache(maxsize=1)
+def easy_words():
+    ref = importlib.resources.files("textstat").joinpath("resources/en/easy_words.txt")
+    with ref.open() as f:
+        return frozenset(line.strip() for line in f)
+
+
+@lru_cache(maxsize=200_000)
+def syllables(word: str):
+    """
+    syllables of a lower-cased word, memoized across documents
+    """
+    try:
+        return sum(1 for phone in cmudict()[word][0] if phone[-1].isdigit())
+    except (TypeError, IndexError, KeyError):
+        return len(_pyphen.positions(word)) + 1
+
+
+def words(text: str):
+    text = NONCONTRACTION_APOSTROPHE.sub("", text)
+    return PUNCTUATION.sub("", text).split()
+
+
+def text_counts(text: str):
+    """
+    words, sentences, syllables and complex words of a text
+    """
+    easy = easy_words()
+    n_words = n_syllables = n_complex = 0
+    for word in words(text):
+        word = word.lower()
+        count = syllables(word)
+        n_words += 1
+        n_syllables += count
+        if count >= COMPLEX_SYLLABLES and word not in easy:
+            n_complex += 1
+
+    n_sentences = 0
+    if text:
+        pieces = SENTENCE.findall(text)
+        n_sentences = max(1, sum(len(words(piece)) > 2 for piece in pieces))
+    return {
+        "n_words": n_words,
+        "n_sentences": n_sentences,
+        "n_syllables": n_syllables,
+        "n_complex": n_complex,
+    }
+
+
+def scores(counts: dict):
+    """
+    flesch reading ease and gunning fog from the counts, with textstat's zero rules
+    """
+    n_words = counts["n_words"]
+    n_sentences = counts["n_sentences"]
+    words_per_sentence = n_words / n_sentences if n_sentences else 0.0
+    syllables_per_word = counts["n_syllables"] / n_words if n_words else 0.0
+    if words_per_sentence == 0 or syllables_per_word == 0:
+        flesch = 0.0
+    else:
+        flesch = (
+            FRE_BASE
+            - FRE_SENTENCE_LENGTH * words_per_sentence
+            - FRE_SYLL_PER_WORD * syllables_per_word
+        )
+    if n_words:
+        fog = 0.4 * (words_per_sentence + 100 * counts["n_complex"] / n_words)
+    else:
+        fog = 0.0
+    return {"flesch_reading_ease": flesch, "gunning_fog": fog}
+
+
+def readability(text: str):
+    """
+    both scores and their counts for one text
+    """
+    counts = text_counts(text)
+    return {**scores(counts), **counts}
+
+
+def readability_batch(df: pd.DataFrame, column: str = "article_text"):
+    """
+    scores and counts of every row of a text column, indexed like the frame.
+    rows without text get NaN.
+    """
+    rows = [
+        readability(text) if isinstance(text, str) else {} for text in df[column]
+    ]
+    return pd.DataFrame(rows, index=df.index)
+
+
+def compare_with_textstat(texts, tolerance: float = TOLERANCE):
+    """
+    largest absolute difference to textstat's scores on the given texts,
+    and whether it is within the tolerance
+    """
+    worst = {"flesch_reading_ease": 0.0, "gunning_fog": 0.0}
+    for text in texts:
+        ours = readability(text)
+        theirs = {
+            "flesch_reading_ease": textstat.flesch_reading_ease(text),
+            "gunning_fog": textstat.gunning_fog(text),
+        }
+        for name in worst:
+            worst[name] = max(worst[name], abs(ours[name] - theirs[name]))
+    return worst, all(diff <= tolerance for diff in worst.values())
+
+
+def cache_stats():
+    info = syllables.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": info.hits / lookups if lookups else 0.0,
+        "size": info.currsize,
+    }
+
+
+# # testing
+# from corpus_store import load_table
+# df = load_table("data/filtered_articles.csv", columns=["article_text"])
+# print(readability_batch(df).describe())
+# print(compare_with_textstat(df["article_text"]), cache_stats())
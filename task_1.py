@@ -1,14 +1,48 @@
 from newspaper import Article
 import time
 import newspaper
+from newspaper import nlp as newspaper_nlp
+import requests
 import csv
+import io
+import hashlib
+import json
 from colored_text import bcolors
+from frontier import URLFrontier, DEFAULT_FRONTIER_PATH, FETCHED, FAILED, IRRELEVANT
+from article_cache import ArticleCache
+from query_router import QueryAutomaton
 import os
 from datetime import datetime
+from contextlib import ExitStack
 import re
+import asyncio
+import threading
+import tldextract
+import lxml.html
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    ProcessPoolExecutor,
+    wait,
+    FIRST_COMPLETED,
+)
 
 DEFAULT_DATA_PATH = "data/articles.csv"
 DEFAULT_FIELDS = ["title", "date", "source", "article_text"]
+URLS_CSV_PATH = "data/articles_urls.csv"
+USER_AGENT = newspaper.Config().browser_user_agent
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+DEFAULT_SOURCES = [
+    "https://www.yahoo.com/news/world/",
+    "https://edition.cnn.com/world",
+    "https://www.aljazeera.com/news",
+    "https://www.bbc.com/news",
+    "https://www.cbsnews.com/",
+    "https://www.npr.org/sections/world/",
+]
+FEED_TYPES = ["application/rss+xml", "application/atom+xml"]
+MAX_KEYWORDS = newspaper.Config().MAX_KEYWORDS
 
 
 def is_relevant(query_words: list[str], keywords: list[str]):
@@ -80,122 +114,738 @@ def is_article_url(url: str):
     return not bool(pattern.search(url))
 
 
-def get_urls(sources=[]):
+def looks_like_article_path(url: str):
     """
-    get all links from sources list. If no sources were passed in params, a default list is used
+    cheap check on the last path segment: article pages end in a long slug or id
+    (e.g. /2025/10/28/hurricane-melissa-jamaica), section pages don't (e.g. /news/world).
     """
-    article_urls = []
-    if len(sources) == 0:
-        sources = [
-            "https://www.yahoo.com/news/world/",
-            "https://edition.cnn.com/world",
-            "https://www.aljazeera.com/news",
-            "https://www.bbc.com/news",
-            "https://www.cbsnews.com/",
-            "https://www.npr.org/sections/world/",
+    path = urlparse(url).path.strip("/")
+    slug = path.rsplit("/", 1)[-1]
+    return len(slug) >= 10 and ("-" in slug or any(c.isdigit() for c in slug))
+
+
+def same_site(url: str, source: str):
+    a = tldextract.extract(url)
+    b = tldextract.extract(source)
+    return (a.domain, a.suffix) == (b.domain, b.suffix)
+
+
+def extract_page_links(html: str, base_url: str):
+    """
+    return (links, feeds) found in an html page. links are absolute.
+    """
+    doc = lxml.html.fromstring(html)
+    doc.make_links_absolute(base_url)
+    links = [href for href in doc.xpath("//a/@href")]
+    feeds = [
+        el.get("href")
+        for el in doc.xpath("//link[@rel='alternate']")
+        if el.get("type") in FEED_TYPES and el.get("href")
+    ]
+    return links, feeds
+
+
+def extract_xml_links(xml: str):
+    """
+    return (links, child_sitemaps) from an rss/atom feed or a sitemap
+    """
+    root = ET.fromstring(xml.encode("utf-8") if isinstance(xml, str) else xml)
+    is_index = root.tag.endswith("sitemapindex")
+    links = []
+    for el in root.iter():
+        tag = el.tag.rsplit("}", 1)[-1]
+        if tag == "loc" and el.text:
+            links.append(el.text.strip())
+        elif tag == "link":
+            href = el.get("href") or (el.text or "").strip()
+            if href:
+                links.append(href)
+    if is_index:
+        return [], links
+    return links, []
+
+
+async def fetch_async(url: str, timeout: float):
+    return await asyncio.wait_for(
+        asyncio.to_thread(fetch_html, url, timeout, None, 0), timeout
+    )
+
+
+async def discover_source(source: str, timeout: float = 15, max_child_sitemaps: int = 2):
+    """
+    collect candidate article links of one source from its section page, the rss/atom
+    feeds it advertises and the sitemaps listed in robots.txt. all requests of a
+    stage run concurrently. returns (urls, stats).
+    """
+    begin_t = time.monotonic()
+    stats = {"source": source, "requests": 0, "failures": 0}
+    parsed = urlparse(source)
+    root = f"{parsed.scheme}://{parsed.netloc}"
+    candidates = []
+
+    async def get(url):
+        stats["requests"] += 1
+        try:
+            return await fetch_async(url, timeout)
+        except Exception:
+            stats["failures"] += 1
+            return None
+
+    section_html, robots = await asyncio.gather(get(source), get(f"{root}/robots.txt"))
+    feeds = []
+    if section_html:
+        try:
+            links, feeds = extract_page_links(section_html, source)
+            candidates.extend(links)
+        except Exception:
+            stats["failures"] += 1
+    sitemaps = []
+    if robots:
+        sitemaps = [
+            line.split(":", 1)[1].strip()
+            for line in robots.splitlines()
+            if line.lower().startswith("sitemap:")
         ]
-    for source in sources:
-        source = source.strip()
+
+    xml_urls = list(dict.fromkeys(feeds + sitemaps))
+    child_sitemaps = []
+    for xml in await asyncio.gather(*[get(url) for url in xml_urls]):
+        if not xml:
+            continue
         try:
-            paper = newspaper.build(source, memoize_articles=False, language="en")
-            filtered_urls = [url for url in paper.article_urls() if is_article_url(url)]
-            article_urls.extend(filtered_urls)
-            print(
-                f"{len(filtered_urls)} {bcolors.GREEN}Articles from{bcolors.ENDC} {source} {bcolors.GREEN}extracted.{bcolors.ENDC}"
-            )
-        except Exception as e:
-            print(
-                f"{bcolors.RED}Failed on {bcolors.ENDC}{source}: {bcolors.RED}{e}{bcolors.ENDC}"
-            )
-    # save articles urls to a csv file
-    path = "data/articles_urls.csv"
-    fields = ["url"]
-    file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
-    existing_urls = set()
-    if file_exists:
-        with open(path, "r", newline="") as csvfile:
-            reader = csv.reader(csvfile)
-            next(reader, None)
-            existing_urls = {row[0] for row in reader if row}
-
-    with open(path, "a", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(fields)
-        for url in article_urls:
-            if url not in existing_urls:
-                writer.writerow([url])
+            links, children = extract_xml_links(xml)
+        except ET.ParseError:
+            stats["failures"] += 1
+            continue
+        candidates.extend(links)
+        child_sitemaps.extend(children)
+
+    # sitemap indexes can list thousands of files, prefer the news sitemaps
+    child_sitemaps.sort(key=lambda url: "news" not in url)
+    for xml in await asyncio.gather(
+        *[get(url) for url in child_sitemaps[:max_child_sitemaps]]
+    ):
+        if not xml:
+            continue
+        try:
+            candidates.extend(extract_xml_links(xml)[0])
+        except ET.ParseError:
+            stats["failures"] += 1
+
+    urls = [
+        url.split("#", 1)[0]
+        for url in dict.fromkeys(candidates)
+        if url.startswith("http")
+        and same_site(url, source)
+        and is_article_url(url)
+        and looks_like_article_path(url)
+    ]
+    urls = list(dict.fromkeys(urls))
+    stats["links"] = len(urls)
+    stats["elapsed"] = time.monotonic() - begin_t
+    return urls, stats
+
+
+async def discover_all(sources: list[str], timeout: float = 15):
+    return await asyncio.gather(*[discover_source(s, timeout) for s in sources])
+
+
+def run_async(coro):
+    """
+    run a coroutine to completion, also from inside a running event loop (jupyter)
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def discover_urls(sources: list[str], timeout: float = 15):
+    """
+    discover article urls of all sources concurrently. total time is bound by
+    the slowest source. returns (urls, per-source stats).
+    """
+    results = run_async(discover_all([s.strip() for s in sources], timeout))
+    article_urls = []
+    all_stats = []
+    for urls, stats in results:
+        article_urls.extend(urls)
+        all_stats.append(stats)
+        color = bcolors.GREEN if stats["links"] > 0 else bcolors.RED
+        print(
+            f"{stats['links']} {color}Articles from{bcolors.ENDC} {stats['source']} "
+            f"{color}extracted in{bcolors.ENDC} {stats['elapsed']:.1f}s "
+            f"({stats['failures']}/{stats['requests']} requests failed)"
+        )
+    return list(dict.fromkeys(article_urls)), all_stats
+
+
+def get_urls(
+    sources=[],
+    use_newspaper: bool = False,
+    timeout: float = 15,
+    frontier_path: str = DEFAULT_FRONTIER_PATH,
+):
+    """
+    get all links from sources list. If no sources were passed in params, a default list is used.
+    sources are crawled concurrently through their section pages, feeds and sitemaps,
+    use_newspaper=True falls back to the serial newspaper.build() crawl.
+    new links are added to the url frontier, see frontier.py
+    """
+    article_urls = []
+    if len(sources) == 0:
+        sources = DEFAULT_SOURCES
+    if not use_newspaper:
+        article_urls, _ = discover_urls(sources, timeout)
+    else:
+        for source in sources:
+            source = source.strip()
+            try:
+                paper = newspaper.build(source, memoize_articles=False, language="en")
+                filtered_urls = [
+                    url for url in paper.article_urls() if is_article_url(url)
+                ]
+                article_urls.extend(filtered_urls)
+                print(
+                    f"{len(filtered_urls)} {bcolors.GREEN}Articles from{bcolors.ENDC} {source} {bcolors.GREEN}extracted.{bcolors.ENDC}"
+                )
+            except Exception as e:
+                print(
+                    f"{bcolors.RED}Failed on {bcolors.ENDC}{source}: {bcolors.RED}{e}{bcolors.ENDC}"
+                )
+    # save articles urls to the frontier, the old csv file is imported on first use
+    with URLFrontier(frontier_path) as frontier:
+        if len(frontier) == 0:
+            frontier.import_csv(URLS_CSV_PATH)
+        new_urls = frontier.add_urls(article_urls)
+    print(f"{new_urls} {bcolors.GREEN}new urls added to the frontier{bcolors.ENDC}")
 
     return article_urls
 
 
+class HostRateLimiter:
+    """
+    per-host politeness. requests to the same host are spaced at least `delay`
+    seconds apart, requests to different hosts don't wait on each other.
+    after a failure the delay of that host is doubled (up to `max_delay`) until
+    the next successful request.
+    """
+
+    def __init__(self, delay: float = 1.0, max_delay: float = 60.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        self._next_slot = {}
+        self._host_delay = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """
+        block until a request to the host of `url` is allowed
+        """
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._host_delay.get(host, self.delay)
+        if slot > now:
+            time.sleep(slot - now)
+
+    def backoff(self, url: str):
+        host = urlparse(url).netloc
+        with self._lock:
+            delay = self._host_delay.get(host, self.delay)
+            self._host_delay[host] = min(max(delay, 0.5) * 2, self.max_delay)
+
+    def reset(self, url: str):
+        host = urlparse(url).netloc
+        with self._lock:
+            self._host_delay.pop(host, None)
+
+
+def fetch_response(
+    url: str,
+    timeout: float = 10,
+    limiter: HostRateLimiter = None,
+    retries: int = 2,
+    headers: dict = None,
+):
+    """
+    GET a page. if a rate limiter is passed, the request waits for its turn on the
+    host and failed requests (connection errors, 429 and 5xx) are retried with backoff.
+    """
+    headers = {"User-Agent": USER_AGENT, **(headers or {})}
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.wait(url)
+        try:
+            response = requests.get(url, timeout=timeout, headers=headers)
+        except (requests.ConnectionError, requests.Timeout):
+            response = None
+            if attempt == retries:
+                raise
+        if response is None or response.status_code in RETRY_STATUS_CODES:
+            if limiter is not None:
+                limiter.backoff(url)
+            if attempt < retries:
+                continue
+        elif limiter is not None:
+            limiter.reset(url)
+        response.raise_for_status()
+        return response
+
+
+def fetch_html(
+    url: str,
+    timeout: float = 10,
+    limiter: HostRateLimiter = None,
+    retries: int = 2,
+):
+    """
+    download the html of a page, see fetch_response()
+    """
+    return fetch_response(url, timeout, limiter, retries).text
+
+
+def load_page(
+    url: str,
+    timeout: float = 10,
+    limiter: HostRateLimiter = None,
+    cache: ArticleCache = None,
+):
+    """
+    return (html, parsed) of a page. with a cache, fresh entries are served without a
+    request and stale ones are revalidated; parsed is the cached parse result if the
+    page didn't change since it was parsed, otherwise None.
+    """
+    if cache is None:
+        return fetch_html(url, timeout, limiter), None
+    entry = cache.get(url)
+    headers = {}
+    if entry is not None:
+        if cache.is_fresh(entry) and entry["parsed"] is not None:
+            return None, entry["parsed"]
+        html = cache.html(entry)
+        if html is not None:
+            if cache.is_fresh(entry):
+                return html, None
+            headers = cache.validators(entry)
+    response = fetch_response(url, timeout, limiter, headers=headers)
+    if response.status_code == 304:
+        cache.touch(entry)
+        return html, entry["parsed"]
+    entry = cache.put(
+        url,
+        response.text,
+        response.headers.get("ETag"),
+        response.headers.get("Last-Modified"),
+    )
+    return response.text, entry["parsed"]
+
+
+def split_article(title: str, text: str):
+    """
+    title and body split into words the way newspaper does it for keywords
+    """
+    return (
+        newspaper_nlp.split_words(title) or [],
+        newspaper_nlp.split_words(text) or [],
+    )
+
+
+def extract_keywords(title: str, text: str):
+    """
+    keyword part of Article.nlp(), the summary it also computes isn't used here
+    """
+    newspaper_nlp.load_stopwords("en")
+    text_keyws = list(newspaper_nlp.keywords(text).keys())
+    title_keyws = list(newspaper_nlp.keywords(title).keys())
+    keyws = list(set(title_keyws + text_keyws))
+    return keyws[:MAX_KEYWORDS]
+
+
+def parse_article(url: str, html: str, automaton: QueryAutomaton = None):
+    """
+    parse downloaded html and extract keywords. runs in a worker process when
+    get_articles() is called with parse_workers > 0, so only plain data is returned.
+    if an automaton is passed, keywords are only extracted for articles whose text
+    matches at least one of its queries, for the others "keywords" is None.
+    """
+    result = Article(url, language="en")
+    result.download(input_html=html)
+    result.parse()
+    parsed = {
+        "url": result.url,
+        "title": result.title,
+        "publish_date": str(result.publish_date),
+        "source_url": result.source_url,
+        "text": result.text,
+        "keywords": None,
+    }
+    if automaton is None or automaton.matching_queries(
+        *split_article(result.title, result.text)
+    ):
+        parsed["keywords"] = extract_keywords(result.title, result.text)
+    return parsed
+
+
+def add_keywords(parsed: dict):
+    return {**parsed, "keywords": extract_keywords(parsed["title"], parsed["text"])}
+
+
 def get_articles(
-    urls: list[str], query_words: list[str], live_save: bool = False, limit: int = 30
+    urls: list[str],
+    query_words: list[str],
+    live_save: bool = False,
+    limit: int = 30,
+    **kwargs,
 ):
     """
     download and parse article data. If article is not relevant according to query, discard it.
     relevant article data are saved to a csv file.
+    see route_articles() for the other parameters.
+    """
+    routed = route_articles(
+        urls,
+        {"query": query_words},
+        live_save=live_save,
+        limit=limit,
+        paths={"query": DEFAULT_DATA_PATH},
+        **kwargs,
+    )
+    return routed["query"]
+
+
+def route_articles(
+    urls: list[str],
+    queries: dict[str, list[str]],
+    live_save: bool = False,
+    limit: int = 30,
+    paths: dict[str, str] = None,
+    max_workers: int = 1,
+    parse_workers: int = 0,
+    per_host_delay: float = 1.0,
+    timeout: float = 10,
+    frontier: URLFrontier = None,
+    cache: ArticleCache = None,
+):
+    """
+    download and parse articles once and route each of them to every query it is
+    relevant to. queries map a name to a list of query words, results are returned
+    per query name and with live_save=True saved to paths[name]
+    (default data/articles_<name>.csv) through a CorpusWriter.
+
+    downloads run on `max_workers` threads, spaced per host by `per_host_delay` seconds.
+    parsing and keyword extraction run on `parse_workers` processes (0 = in this process).
+    keywords are only extracted for articles whose text contains the words of a query.
+    processing stops once every query has `limit` relevant articles.
+    if a frontier is passed, the outcome of every url is recorded in it.
+    if a cache is passed, pages and parse results are reused across runs, so
+    re-running with other query words doesn't download everything again.
     """
     begin_t = datetime.now()
-    articles = []
-    count = 0
-    for url in urls:
-        if count >= limit:
-            break
-        try:
-            result = Article(url, language="en")
-            result.download()
-            result.parse()
-            result.nlp()
-            k_words = result.keywords
-            print(f"{bcolors.BLUE}Prcessing {bcolors.ENDC}{result.url}...")
-            if is_relevant(query_words, k_words):
-                article = [
-                    result.title,
-                    str(result.publish_date),
-                    result.source_url,
-                    result.text,
-                ]
-                articles.append(article)
-                if live_save:
-                    append_article_to_csv(article)
+    automaton = QueryAutomaton(queries)
+    paths = {name: f"data/articles_{name}.csv" for name in queries} | (paths or {})
+    articles = {name: [] for name in queries}
+    counters = dict.fromkeys(
+        ["pages", "failed", "prefilter_rejected", "keyword_rejected", "accepted"], 0
+    )
+    limiter = HostRateLimiter(delay=per_host_delay)
+    fetch_pool = ThreadPoolExecutor(max_workers=max_workers)
+    parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers > 0 else None
+    max_pending = 2 * (max_workers + parse_workers)
+    url_iter = iter(urls)
+    pending = {}
+    writers = {}
 
-                print(
-                    f"{bcolors.GREEN}Added {bcolors.ENDC}{result.url} {bcolors.GREEN}to articles{bcolors.ENDC}"
-                )
-            time.sleep(1)
-        except Exception as e:
-            print(
-                f"{bcolors.RED}Failed on {bcolors.ENDC}{result.url}: {bcolors.RED}{e}{bcolors.ENDC}"
-            )
+    def top_up():
+        while len(pending) < max_pending:
+            url = next(url_iter, None)
+            if url is None:
+                return
+            future = fetch_pool.submit(load_page, url, timeout, limiter, cache)
+            pending[future] = ("fetch", url)
+
+    def open_queries():
+        return [name for name in queries if len(articles[name]) < limit]
+
+    def run(stage: str, url: str, fn, *args):
+        if parse_pool is None:
+            done(stage, url, fn(*args))
+        else:
+            pending[parse_pool.submit(fn, *args)] = (stage, url)
+
+    def mark(url: str, status: str, error: str = None):
+        if frontier is not None:
+            frontier.mark(url, status, error)
+
+    def done(stage: str, url: str, result):
+        if stage == "fetch":
+            counters["pages"] += 1
+            html, parsed = result
+            if parsed is None:
+                run("parse", url, parse_article, url, html, automaton)
+            elif parsed["keywords"] is not None:
+                handle(url, parsed)
+            elif automaton.matching_queries(
+                *split_article(parsed["title"], parsed["text"])
+            ):
+                run("keywords", url, add_keywords, parsed)
+            else:
+                reject(url, parsed)
+            return
+        parsed = result
+        if cache is not None:
+            cache.put_parsed(url, parsed)
+        if parsed["keywords"] is None:
+            reject(url, parsed)
+        else:
+            handle(url, parsed)
+
+    def reject(url: str, parsed: dict):
+        print(f"{bcolors.BLUE}Prcessing {bcolors.ENDC}{parsed['url']}...")
+        counters["prefilter_rejected"] += 1
+        mark(url, IRRELEVANT)
+
+    def handle(url: str, parsed: dict):
+        print(f"{bcolors.BLUE}Prcessing {bcolors.ENDC}{parsed['url']}...")
+        relevant = automaton.relevant_queries(parsed["keywords"])
+        if not relevant:
+            counters["keyword_rejected"] += 1
+            mark(url, IRRELEVANT)
+            return
+        targets = relevant & set(open_queries())
+        if not targets:
+            # only relevant to queries that are already full: leave it pending so a
+            # later run can still pick it up
+            return
+        article = [
+            parsed["title"],
+            parsed["publish_date"],
+            parsed["source_url"],
+            parsed["text"],
+        ]
+        counters["accepted"] += 1
+        for name in targets:
+            articles[name].append(article)
+            if live_save:
+                writers[name].write(article)
+
+        mark(url, FETCHED)
+        routed = f" ({', '.join(sorted(targets))})" if len(queries) > 1 else ""
+        print(
+            f"{bcolors.GREEN}Added {bcolors.ENDC}{parsed['url']} {bcolors.GREEN}to articles{bcolors.ENDC}{routed}"
+        )
+
+    with ExitStack() as stack:
+        if live_save:
+            for name in queries:
+                writers[name] = stack.enter_context(CorpusWriter(paths[name]))
+        try:
+            top_up()
+            while pending and open_queries():
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, url = pending.pop(future)
+                    try:
+                        done(stage, url, future.result())
+                    except Exception as e:
+                        counters["failed"] += 1
+                        mark(url, FAILED, str(e))
+                        print(
+                            f"{bcolors.RED}Failed on {bcolors.ENDC}{url}: {bcolors.RED}{e}{bcolors.ENDC}"
+                        )
+                top_up()
+        finally:
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
+            if parse_pool is not None:
+                parse_pool.shutdown(wait=False, cancel_futures=True)
     end_t = datetime.now()
     print(f"\nProcess finished!\nElapsed time: {end_t - begin_t}")
+    print(
+        f"{counters['pages']} pages, {counters['failed']} failed, "
+        f"{counters['prefilter_rejected']} rejected by the text pre-filter, "
+        f"{counters['keyword_rejected']} rejected on keywords, "
+        f"{counters['accepted']} accepted"
+    )
+    if len(queries) > 1:
+        for name in queries:
+            print(f"{bcolors.GREEN}{name}:{bcolors.ENDC} {len(articles[name])} articles")
     return articles
 
 
+class CorpusWriter:
+    """
+    buffered, crash-safe csv writer for articles.
+
+    rows are buffered and appended in batches of `batch_size` rows or every
+    `flush_interval` seconds. each batch goes to disk with a single write followed
+    by fsync, then the new file length is recorded in a "<path>.commit" marker,
+    together with the file's inode and a hash of the last committed bytes. when the
+    file is opened again and the marker still describes it, anything past the
+    recorded length (a batch cut off by a killed process) is truncated, so the file
+    never ends in a partial row. a file replaced or rewritten by other means no
+    longer matches its marker and is left as it is.
+
+    example:
+    with CorpusWriter("data/articles.csv") as writer:
+        writer.write(article)
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DATA_PATH,
+        fields: list[str] = DEFAULT_FIELDS,
+        batch_size: int = 50,
+        flush_interval: float = 5.0,
+    ):
+        self.path = path
+        self.fields = fields
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.marker_path = f"{path}.commit"
+        self.buffer = []
+        self.file = None
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        self.recover()
+        self.file = open(self.path, "ab")
+        if self.file.tell() == 0:
+            self.buffer.insert(0, self.fields)
+            self.flush()
+
+    def recover(self):
+        """
+        drop a partially written batch left behind by a crash
+        """
+        if not os.path.isfile(self.path):
+            return
+        size = os.path.getsize(self.path)
+        committed = read_commit_marker(self.path)
+        if committed is None:
+            committed = size  # no matching marker, the file was written by other means
+        if size > committed:
+            with open(self.path, "r+b") as f:
+                f.truncate(committed)
+            print(
+                f"{bcolors.YELLOW}Dropped {size - committed} bytes of an unfinished write in {bcolors.ENDC}{self.path}"
+            )
+
+    def write(self, row: list[str]):
+        self.buffer.append(row)
+        if (
+            len(self.buffer) >= self.batch_size
+            or time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def writerows(self, rows: list[list[str]]):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        chunk = io.StringIO()
+        csv.writer(chunk).writerows(self.buffer)
+        self.file.write(chunk.getvalue().encode("utf-8"))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        write_commit_marker(self.path, self.file.tell())
+        self.buffer = []
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+
+
+COMMIT_TAIL_BYTES = 4096
+
+
+def committed_tail_hash(path: str, size: int):
+    """
+    sha256 of the last COMMIT_TAIL_BYTES bytes before `size`
+    """
+    start = max(0, size - COMMIT_TAIL_BYTES)
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(size - start)).hexdigest()
+
+
+def write_commit_marker(path: str, size: int):
+    """
+    record the committed length of a csv file, see CorpusWriter
+    """
+    marker = {
+        "size": size,
+        "inode": os.stat(path).st_ino,
+        "tail_sha256": committed_tail_hash(path, size),
+    }
+    tmp_path = f"{path}.commit.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(marker, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, f"{path}.commit")
+
+
+def read_commit_marker(path: str):
+    """
+    the committed length of a csv file, or None if there is no marker or it doesn't
+    describe the file as it is now (another inode, or other bytes before that length)
+    """
+    try:
+        with open(f"{path}.commit", "r") as f:
+            marker = json.load(f)
+        size = int(marker["size"])
+        if os.stat(path).st_ino != marker["inode"] or size > os.path.getsize(path):
+            return None
+        if committed_tail_hash(path, size) != marker["tail_sha256"]:
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return size
+
+
 def articles2csv(
     articles: list[list[str]] = [], path: str = DEFAULT_DATA_PATH, fields=DEFAULT_FIELDS
 ):
     """
-    save list of article data to a csv file
+    save list of article data to a csv file. the file is written to a temporary file
+    first and renamed, so an interrupted save leaves the previous file intact.
     """
-    with open(path, "w") as csvfile:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as csvfile:
         csvwriter = csv.writer(csvfile)
         csvwriter.writerow(fields)
         if len(articles) > 0:
             csvwriter.writerows(articles)
+        csvfile.flush()
+        os.fsync(csvfile.fileno())
+    os.replace(tmp_path, path)
+    write_commit_marker(path, os.path.getsize(path))
 
 
 def append_article_to_csv(article: list[str], path: str = DEFAULT_DATA_PATH):
     """
     append data of one article to a csv file. if no file exists, one is created.
+    to save many articles, keep a CorpusWriter open instead.
     """
-    file_exists = os.path.isfile(path) and os.path.getsize(path) > 0
-    with open(path, mode="a", newline="") as csvfile:
-        csvwriter = csv.writer(csvfile)
-        if not file_exists:
-            csvwriter.writerow(DEFAULT_FIELDS)
-        csvwriter.writerow(article)
+    with CorpusWriter(path, batch_size=1) as writer:
+        writer.write(article)
 
 
 # # testing
@@ -203,3 +853,22 @@ def append_article_to_csv(article: list[str], path: str = DEFAULT_DATA_PATH):
 # qw = ["hurricane", "melissa"]
 # # articles2csv()
 # get_articles(urls, qw, limit=15, live_save=True)
+
+# # only fetch urls that were not processed in earlier runs
+# with URLFrontier() as frontier:
+#     get_articles(frontier.pending_urls(), qw, frontier=frontier, live_save=True)
+
+# # re-run with other query words from the article cache, without a network pass
+# get_articles(urls, ["storm", "jamaica"], cache=ArticleCache(), limit=200)
+
+# # several storms in one pass, saved to data/articles_<name>.csv
+# route_articles(
+#     urls,
+#     {"melissa": ["hurricane", "melissa"], "kalmaegi": ["typhoon", "kalmaegi"]},
+#     live_save=True,
+# )
+
+# # testing concurrent fetching against stored pages served locally
+# # (python -m http.server 8000 --directory <folder with saved html pages>)
+# local_urls = [f"http://localhost:8000/{name}" for name in os.listdir("<folder>")]
+# get_articles(local_urls, qw, max_workers=8, parse_workers=4, per_host_delay=0)
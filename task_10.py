@@ -2,51 +2,35 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from nltk.tokenize import word_tokenize
-from collections import Counter
 import seaborn as sns
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import plotly.graph_objects as go
+from corpus_store import load_table
+from term_index import load_index
 
 
 def zipf_graph(df: pd.DataFrame):
     """Perform Zipf’s Law analysis and visualize rank-frequency relationship."""
 
-    texts_df = df["clean_text"]
-    texts = list(texts_df)
-
-    # corpus data
-    corpus = " ".join(texts)
-
-    def process_text(text: str):
-        tokens = word_tokenize(text)
-        freq_dist = Counter(tokens)
-        ranks = list(range(1, len(freq_dist) + 1))
-        total = sum(freq_dist.values())
-        ranks = list(range(1, len(freq_dist) + 1))
-        frequencies = [freq / total for _, freq in freq_dist.most_common()]
-        return ranks, frequencies
-
-    corpus_ranks, corpus_freqs = process_text(corpus)
+    # corpus and per article counts from the term-frequency index
+    index = load_index(df["clean_text"])
+    corpus_ranks, corpus_counts, _, _ = index.zipf()
+    corpus_freqs = corpus_counts / corpus_counts.sum()
 
     # ideal Zipf's law data
-    zipf_freqs = [corpus_freqs[0] / rank for rank in corpus_ranks]
+    zipf_freqs = corpus_freqs[0] / corpus_ranks
 
-    # per article data
-    texts_ranks_freqs = []
-    for row in texts:
-        ranks, freqs = process_text(row)
-        texts_ranks_freqs.append([ranks, freqs])
-
-    lines = texts_ranks_freqs
     num_lines = st.sidebar.slider(
         "Number of articles to show",
         min_value=1,
-        max_value=len(texts_ranks_freqs),
+        max_value=index.doc_counts.shape[0],
         value=2,
     )
 
+    # per article data, only for the articles shown
+    lines = [index.doc_rank_frequencies(i) for i in range(num_lines)]
+
     fig, ax = plt.subplots()
     plt.loglog(
         corpus_ranks, corpus_freqs, color="#026400FF", label="Corpus of all articles"
@@ -174,14 +158,14 @@ def streamlit_dash(
 
 # Testing
 
-data1 = pd.read_csv("data/cleaned_data.csv")
-data2 = pd.read_csv(
+data1 = load_table("data/cleaned_data.csv", columns=["clean_text"])
+data2 = load_table(
     "data/sentiment_emotion_analysis.csv",
-    usecols=["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"],
+    columns=["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"],
 )
-data3 = pd.read_csv(
+data3 = load_table(
     "data/scored_articles.csv",
-    usecols=[
+    columns=[
         "neg_emo_intensity",
         "neu_emo_intensity",
         "pos_emo_intensity",
@@ -1,57 +1,278 @@
 import nltk
 from nltk.corpus import stopwords
-from nltk.corpus import wordnet as wn
 from nltk.tokenize import word_tokenize
 from nltk.tag import pos_tag
 import csv
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable
+from corpus_store import store_is_current, read_store, csv_to_store
+from normalizer import normalizer, penn_to_wn_tag
 
-STOPWORDS = stopwords.words("english")
+STOPWORDS = normalizer.stopwords
 DEFAULT_DATA_PATH = "data/articles.csv"
+DEFAULT_CLEAN_PATH = "data/cleaned_data.csv"
+CLEAN_FIELDS = ["title", "date", "source", "article_text", "clean_text"]
+STORE_CHUNK_SIZE = 10_000
 
-wnl = nltk.WordNetLemmatizer()
 
-
-def load_file(path: str = DEFAULT_DATA_PATH):
+def load_file(path: str = DEFAULT_DATA_PATH, columns: list[str] = None):
+    """
+    load a csv table as a list of rows, header row first. with `columns` only those
+    columns are returned, read from the corpus store when it is up to date.
+    """
+    if columns is not None and store_is_current(path):
+        df = read_store(path, columns).fillna("").astype(str)
+        return [list(columns)] + df.values.tolist()
     with open(path, "r") as csvfile:
         reader = csv.reader(csvfile)
-
-        return [row for row in reader]
+        if columns is None:
+            return [row for row in reader]
+        header = next(reader)
+        idx = [header.index(c) for c in columns]
+        return [list(columns)] + [[row[i] for i in idx] for row in reader]
 
 
 def is_alpha_not_sw(word: str):
-    return word.isalpha() and word not in STOPWORDS
+    return normalizer.is_content_word(word)
+
+
+def clean_row(row: list[str]):
+    """
+    lemmatize an article row and append its clean text
+    """
+    title, date, source, article_text = row
+    text_tokens = word_tokenize(article_text.lower())
+    tagged_tokens = pos_tag(text_tokens)
+    clean_text = " ".join(normalizer.normalize(tagged_tokens))
+    return [title, date, source, article_text, clean_text]
+
+
+def iter_rows(path: str = DEFAULT_DATA_PATH, skip_header: bool = True):
+    """
+    stream the rows of a csv file without loading it
+    """
+    with open(path, "r", newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        if skip_header:
+            next(reader, None)
+        yield from reader
+
 
+def init_worker():
+    """
+    load the tagger and wordnet once per worker process instead of on first use
+    """
+    pos_tag(["warm", "up"])
+    normalizer.lemmatize("warming", "v")
 
-def penn_to_wn_tag(tag: str):
 
-    if tag.startswith("J"):
-        return wn.ADJ
-    elif tag.startswith("N"):
-        return wn.NOUN
-    elif tag.startswith("R"):
-        return wn.ADV
-    elif tag.startswith("V"):
-        return wn.VERB
-    return wn.NOUN
+def clean_chunk(rows: list[list[str]]):
+    return [clean_row(row) for row in rows]
 
 
-def clean_text(data: list[list[str]]):
+def iter_clean_text(
+    rows: Iterable[list[str]], workers: int = 1, chunk_size: int = 32
+):
+    """
+    clean a stream of article rows. with workers > 1 the rows are cleaned in chunks
+    of `chunk_size` on a process pool; results keep the input order and only a few
+    chunks per worker are in flight at a time.
+    """
+    if workers <= 1:
+        for row in rows:
+            yield clean_row(row)
+        return
+    rows = iter(rows)
+    with ProcessPoolExecutor(workers, initializer=init_worker) as pool:
+        in_flight = deque()
+        while True:
+            while len(in_flight) < 2 * workers:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                in_flight.append(pool.submit(clean_chunk, chunk))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().result()
+
+
+def write_rows(
+    rows: Iterable[list[str]],
+    path: str,
+    fields: list[str] = CLEAN_FIELDS,
+    chunk_size: int = 100,
+):
+    """
+    write a stream of rows in chunks of `chunk_size`, so at most one chunk is held
+    in memory. the file is replaced only once all rows are written, then the corpus
+    store is updated from it in chunks of STORE_CHUNK_SIZE rows.
+    """
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fields)
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            writer.writerows(chunk)
+            count += len(chunk)
+    os.replace(tmp_path, path)
+    csv_to_store(path, chunk_size=STORE_CHUNK_SIZE)
+    return count
+
+
+def clean_file(
+    in_path: str = DEFAULT_DATA_PATH,
+    out_path: str = DEFAULT_CLEAN_PATH,
+    chunk_size: int = 100,
+    workers: int = 1,
+):
+    """
+    clean a csv file of articles row by row, memory use doesn't depend on its size
+    """
+    rows = iter_clean_text(iter_rows(in_path), workers=workers)
+    return write_rows(rows, out_path, chunk_size=chunk_size)
+
+
+def clean_text(data: list[list[str]], workers: int = 1):
     data = data[1:]
-    new_data = []
-    for row in data:
-        title, date, source, article_text = row
-        clean_words = []
-        text_tokens = word_tokenize(article_text.lower())
-        tagged_tokens = pos_tag(text_tokens)
-        for word, tag in tagged_tokens:
-            if is_alpha_not_sw(word):
-                wn_pos = penn_to_wn_tag(tag)
-                lem_word = wnl.lemmatize(word, pos=wn_pos)
-                clean_words.append(lem_word)
-        clean_text = " ".join(clean_words)
-        new_data.append([title, date, source, article_text, clean_text])
-
-    return new_data
+    return list(iter_clean_text(data, workers=workers))
+
+
+def text_hash(article_text: str):
+    return hashlib.sha1(article_text.encode("utf-8")).hexdigest()
+
+
+def load_clean_index(out_path: str, index_path: str):
+    """
+    map text hash -> clean text of an existing cleaned file. the index holds the size
+    of the cleaned file it belongs to, followed by one hash per row. if there is no
+    index or it doesn't match the file (e.g. the file was rewritten by other means),
+    the hashes are recomputed from the article_text column of the file.
+    """
+    if not os.path.isfile(out_path):
+        return {}
+    hashes = None
+    if os.path.isfile(index_path):
+        with open(index_path, "r") as f:
+            size = f.readline().strip()
+            hashes = [line.strip() for line in f]
+        if size != str(os.path.getsize(out_path)):
+            hashes = None
+    cached = {}
+    for i, row in enumerate(iter_rows(out_path)):
+        if hashes is None or i >= len(hashes):
+            cached[text_hash(row[3])] = row[4]
+        else:
+            cached[hashes[i]] = row[4]
+    return cached
+
+
+def clean_file_incremental(
+    in_path: str = DEFAULT_DATA_PATH,
+    out_path: str = DEFAULT_CLEAN_PATH,
+    index_path: str = None,
+    workers: int = 1,
+):
+    """
+    like clean_file(), but only new or changed articles are cleaned. the clean text
+    of articles whose text hash is in the side index of the previous run is reused,
+    so a refresh costs time in proportion to the new articles.
+    """
+    index_path = index_path or f"{out_path}.index"
+    cached = load_clean_index(out_path, index_path)
+    new_rows = {}
+    for row in iter_rows(in_path):
+        h = text_hash(row[3])
+        if h not in cached and h not in new_rows:
+            new_rows[h] = row
+    cleaned = {
+        h: row[4]
+        for h, row in zip(
+            new_rows, iter_clean_text(new_rows.values(), workers=workers)
+        )
+    }
+    hashes = []
+    reused = 0
+
+    def merged_rows():
+        nonlocal reused
+        for row in iter_rows(in_path):
+            h = text_hash(row[3])
+            hashes.append(h)
+            if h in cached:
+                reused += 1
+                yield [*row, cached[h]]
+            else:
+                yield [*row, cleaned[h]]
+
+    count = write_rows(merged_rows(), out_path)
+    print(f"{len(cleaned)} articles cleaned, {reused} reused")
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(f"{os.path.getsize(out_path)}\n")
+        f.writelines(f"{h}\n" for h in hashes)
+    os.replace(tmp_path, index_path)
+    return count
+
+
+def benchmark_clean_text(
+    path: str = DEFAULT_DATA_PATH, worker_counts=(1, 2, 4, 8, 16, 32)
+):
+    """
+    time clean_text() on a csv file for each number of workers
+    """
+    data = load_file(path)
+    base = None
+    print(f"{len(data) - 1} articles")
+    for workers in worker_counts:
+        if workers > (os.cpu_count() or 1):
+            break
+        begin_t = time.perf_counter()
+        clean_text(data, workers=workers)
+        elapsed = time.perf_counter() - begin_t
+        base = base or elapsed
+        print(
+            f"workers={workers:<3} {elapsed:8.2f}s  "
+            f"{(len(data) - 1) / elapsed:8.1f} articles/s  speedup x{base / elapsed:.2f}"
+        )
+
+
+def benchmark_normalization(path: str = DEFAULT_DATA_PATH, n_rows: int = None):
+    """
+    tokens per second of stopword filtering + lemmatization, with the old list scan
+    and uncached lemmatizer against the shared normalizer, on the same tagged tokens
+    """
+    data = load_file(path, columns=["article_text"])[1:][:n_rows]
+    tagged = [pos_tag(word_tokenize(row[0].lower())) for row in data]
+    n_tokens = sum(len(tokens) for tokens in tagged)
+    stopword_list = stopwords.words("english")
+    wnl = nltk.WordNetLemmatizer()
+
+    begin_t = time.perf_counter()
+    for tokens in tagged:
+        [
+            wnl.lemmatize(word, pos=penn_to_wn_tag(tag))
+            for word, tag in tokens
+            if word.isalpha() and word not in stopword_list
+        ]
+    before = time.perf_counter() - begin_t
+
+    normalizer.clear()
+    begin_t = time.perf_counter()
+    for tokens in tagged:
+        normalizer.normalize(tokens)
+    after = time.perf_counter() - begin_t
+
+    print(f"{n_tokens} tokens in {len(tagged)} articles")
+    print(f"before: {n_tokens / before:12.0f} tokens/s")
+    print(f"after:  {n_tokens / after:12.0f} tokens/s  (x{before / after:.1f})")
+    print(f"lemma cache: {normalizer.stats()}")
 
 
 # # testing
@@ -66,3 +287,14 @@ def clean_text(data: list[list[str]]):
 #     fields=["title", "date", "source", "article_text", "clean_text"],
 # )
 # print(load_file(path="data/cleaned_data.csv")[1][4][3])
+
+# # same result, streamed from disk to disk in chunks
+# clean_file("data/articles.csv", "data/cleaned_data.csv")
+
+# # in parallel, and how it scales with the number of cores
+# cleaned_data = clean_text(data, workers=8)
+# benchmark_clean_text()
+# benchmark_normalization()
+
+# # daily refresh: only clean articles added or changed since the last run
+# clean_file_incremental("data/articles.csv", "data/cleaned_data.csv", workers=4)
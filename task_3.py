@@ -1,23 +1,122 @@
+import hashlib
+import os
+import re
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from langdetect import detect, DetectorFactory
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from corpus_store import save_table
+from near_duplicates import NearDuplicateClusters, find_near_duplicates
 
 DetectorFactory.seed = 0
 
-def filter_english_articles_with_descriptive_stats(df, output_path="data/filtered_articles.csv"):
-    """Filter non-english and duplicate articles."""
+WORD_PATTERN = re.compile(r"[a-z]+")
 
-    def is_english(text):
-        try:
-            return detect(text) == "en"
-        except:
-            return False
 
-    df["is_english"] = [is_english(text) for text in df["article_text"]]
+def is_english(text):
+    try:
+        return detect(text) == "en"
+    except:
+        return False
+
+
+def stopword_ratio(text: str):
+    """Share of words that are english stopwords, and the number of words."""
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return 0.0, 0
+    return sum(w in ENGLISH_STOP_WORDS for w in words) / len(words), len(words)
+
+
+def detect_english(
+    texts,
+    prefix_chars=1000,
+    stopword_threshold=0.3,
+    min_words=20,
+    workers=1,
+):
+    """
+    Language ID on the first `prefix_chars` characters of each text. Texts where at
+    least `stopword_threshold` of the words are english stopwords are accepted without
+    calling langdetect; the rest go through langdetect on a process pool.
+    """
+    results = []
+    undecided = {}
+    for i, text in enumerate(texts):
+        if not isinstance(text, str):
+            results.append(False)
+            continue
+        prefix = text[:prefix_chars]
+        ratio, n_words = stopword_ratio(prefix)
+        results.append(n_words >= min_words and ratio >= stopword_threshold)
+        if not results[i]:
+            undecided[i] = prefix
+
+    if workers > 1 and len(undecided) > workers:
+        with ProcessPoolExecutor(workers) as pool:
+            detected = list(pool.map(is_english, undecided.values(), chunksize=16))
+    else:
+        detected = [is_english(prefix) for prefix in undecided.values()]
+    for i, english in zip(undecided, detected):
+        results[i] = english
+
+    print(
+        f"Language ID: {len(results) - len(undecided)} accepted by stopword ratio, "
+        f"{len(undecided)} checked with langdetect"
+    )
+    return results
+
+
+def remove_near_duplicates(df, threshold=0.8, clusters_path=None):
+    """
+    Keep one canonical article (the first one) per cluster of near-duplicate texts,
+    e.g. the same wire story syndicated with a different headline or footer. Every
+    article gets a cluster_id and the cluster_size of its cluster before the
+    duplicates are dropped. The full membership is saved to `clusters_path` if given.
+    """
+    canonical = find_near_duplicates(
+        df["article_text"].tolist(), threshold=threshold, keys=list(df.index)
+    )
+    canonical = pd.Series(canonical, index=df.index)
+    cluster_ids = {key: i for i, key in enumerate(canonical.unique())}
+    df = df.assign(cluster_id=canonical.map(cluster_ids))
+    df["cluster_size"] = df.groupby("cluster_id")["cluster_id"].transform("size")
+
+    if clusters_path is not None:
+        members = df.assign(canonical=df.index == canonical)
+        columns = ["cluster_id", "canonical", "title"]
+        columns += [c for c in ["source", "date"] if c in df.columns]
+        members[columns].to_csv(clusters_path, index=False)
+    return df[df.index == canonical]
+
+
+def filter_english_articles_with_descriptive_stats(
+    df,
+    output_path="data/filtered_articles.csv",
+    workers=1,
+    near_dup_threshold=0.8,
+    clusters_path="data/near_duplicate_clusters.csv",
+):
+    """Filter non-english, duplicate and near-duplicate articles.
+    near_dup_threshold is the estimated jaccard similarity of the word shingles
+    above which two articles count as the same story (None keeps near-duplicates)."""
+
+    df["is_english"] = detect_english(df["article_text"], workers=workers)
     df_english = df[df["is_english"] == True].copy()
 
     # Remove duplicates and missing values
     df_english.drop_duplicates(subset=["title", "article_text"], inplace=True)
     df_english.dropna(subset=["title", "article_text"], inplace=True)
+    exact_removed = len(df) - len(df_english)
+
+    near_dups_removed = 0
+    if near_dup_threshold is not None:
+        n_before = len(df_english)
+        df_english = remove_near_duplicates(
+            df_english, near_dup_threshold, clusters_path
+        )
+        near_dups_removed = n_before - len(df_english)
 
     # Summary
     total_valid_articles = len(df_english)
@@ -27,12 +126,114 @@ def filter_english_articles_with_descriptive_stats(df, output_path="data/filtere
     print(f"Average text length (in words): {avg_length:.2f} words")
     print(f"Number of articles before: {len(df)}")
     print(f"Number of articles now: {len(df_english)}")
-    print(f"Duplicate articles removed: {len(df) - len(df_english)}")
+    print(f"Duplicate articles removed: {exact_removed}")
+    print(f"Near-duplicate articles removed: {near_dups_removed}")
 
     # Save
-    df_english.to_csv(output_path, index=False)
+    save_table(df_english, output_path)
+    print(f"Saved filtered dataset to {output_path}")
+
+def duplicate_key(title, text):
+    """Fixed-size hash of the (title, article_text) pair drop_duplicates compares."""
+    data = f"{title}\0{text}".encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def filter_english_articles_chunked(
+    input_path="data/cleaned_data.csv",
+    output_path="data/filtered_articles.csv",
+    chunksize=1000,
+    workers=1,
+    near_dup_threshold=0.8,
+    clusters_path="data/near_duplicate_clusters.csv",
+):
+    """Out-of-core version of filter_english_articles_with_descriptive_stats.
+    The input is read `chunksize` rows at a time, only hashes of the seen
+    (title, article_text) pairs and the minhash index of the kept articles stay in
+    memory, and every filtered chunk is appended to the output. The report is the
+    same as the in-memory function's, but the schemas differ: cluster sizes can
+    still grow after a chunk is written, so the output has cluster_id and no
+    cluster_size column; the sizes can be counted from the membership file."""
+
+    seen = set()
+    clusters = NearDuplicateClusters(near_dup_threshold or 1.0)
+    cluster_ids = {}
+    n_total = n_unique = n_kept = n_words = 0
+    tmp_path = f"{output_path}.tmp"
+    tmp_clusters = f"{clusters_path}.tmp" if clusters_path else None
+    for path in (tmp_path, tmp_clusters):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        n_total += len(chunk)
+        chunk["is_english"] = detect_english(chunk["article_text"], workers=workers)
+        chunk = chunk[chunk["is_english"] & chunk["title"].notna()]
+        chunk = chunk[chunk["article_text"].notna()]
+
+        keys = [duplicate_key(t, a) for t, a in zip(chunk["title"], chunk["article_text"])]
+        is_new = []
+        for key in keys:
+            is_new.append(key not in seen)
+            seen.add(key)
+        chunk = chunk.loc[np.array(is_new, dtype=bool)]
+        n_unique += len(chunk)
+
+        if near_dup_threshold is not None:
+            row_ids = range(n_unique - len(chunk), n_unique)
+            canonical = [
+                clusters.assign(i, text) for i, text in zip(row_ids, chunk["article_text"])
+            ]
+            for key in canonical:
+                cluster_ids.setdefault(key, len(cluster_ids))
+            chunk = chunk.assign(
+                cluster_id=[cluster_ids[key] for key in canonical],
+                canonical=[key == i for key, i in zip(canonical, row_ids)],
+            )
+            if tmp_clusters:
+                columns = ["cluster_id", "canonical", "title"]
+                columns += [c for c in ["source", "date"] if c in chunk.columns]
+                chunk[columns].to_csv(
+                    tmp_clusters,
+                    mode="a",
+                    header=not os.path.exists(tmp_clusters),
+                    index=False,
+                )
+            is_canonical = chunk["canonical"].to_numpy(dtype=bool)
+            chunk = chunk.loc[is_canonical].drop(columns="canonical")
+
+        n_words += chunk["article_text"].str.split().str.len().sum()
+        chunk.to_csv(
+            tmp_path, mode="a", header=not os.path.exists(tmp_path), index=False
+        )
+        n_kept += len(chunk)
+
+    if not os.path.exists(tmp_path):
+        # header-only input: write the header of an empty output
+        columns = list(pd.read_csv(input_path, nrows=0).columns) + ["is_english"]
+        if near_dup_threshold is not None:
+            columns.append("cluster_id")
+        pd.DataFrame(columns=columns).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    if tmp_clusters and os.path.exists(tmp_clusters):
+        os.replace(tmp_clusters, clusters_path)
+
+    # Summary
+    print("\nDATA QUALITY REPORT")
+    print(f"Total valid English articles: {n_kept}")
+    avg_length = n_words / n_kept if n_kept else float("nan")
+    print(f"Average text length (in words): {avg_length:.2f} words")
+    print(f"Number of articles before: {n_total}")
+    print(f"Number of articles now: {n_kept}")
+    print(f"Duplicate articles removed: {n_total - n_unique}")
+    print(f"Near-duplicate articles removed: {n_unique - n_kept}")
     print(f"Saved filtered dataset to {output_path}")
 
+
 # Testing
-# data = pd.read_csv("data/cleaned_data.csv")
-# filter_english_articles_with_descriptive_stats(data)
\ No newline at end of file
+# from corpus_store import load_table
+# data = load_table("data/cleaned_data.csv")
+# filter_english_articles_with_descriptive_stats(data)
+# filter_english_articles_with_descriptive_stats(data, workers=4)
+# filter_english_articles_with_descriptive_stats(data, near_dup_threshold=0.5)
+# filter_english_articles_chunked("data/cleaned_data.csv", chunksize=500, workers=4)
\ No newline at end of file
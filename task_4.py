@@ -1,12 +1,43 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
+from corpus_store import save_table
+from count_matrix import load_counts, counts_to_tfidf, top_terms_per_row
 
 
-def plot_and_save(freq_data, title_prefix, score_label, file_prefix):
-    """To create and save bar chart and word cloud."""
+def plot_and_save(
+    freq_data,
+    title_prefix,
+    score_label,
+    file_prefix,
+    show=True,
+    dpi=300,
+    bar_format="png",
+    cloud_format="png",
+    cloud_size=(800, 400),
+):
+    """To create and save bar chart and word cloud.
+    With show=False the charts are rendered headless (Agg, no pyplot state) and a
+    chart is skipped when its file exists and was drawn from the same data and
+    settings. bar_format="svg" saves the bar chart as a vector image."""
+    if not show:
+        return render_charts(
+            freq_data,
+            title_prefix,
+            score_label,
+            file_prefix,
+            dpi,
+            bar_format,
+            cloud_format,
+            cloud_size,
+        )
+
     # Bar Chart
     words, scores = zip(*freq_data[:20])
     plt.figure(figsize=(10, 5))
@@ -15,64 +46,176 @@ def plot_and_save(freq_data, title_prefix, score_label, file_prefix):
     plt.xlabel(score_label)
     plt.ylabel("Word")
     plt.tight_layout()
-    plt.savefig(f"top20_{file_prefix}_bar.png", dpi=300)
+    plt.savefig(f"top20_{file_prefix}_bar.{bar_format}", dpi=dpi)
     plt.show()
 
     # Word Cloud
-    wordcloud = WordCloud(width=800, height=400, background_color="white")
+    wordcloud = WordCloud(
+        width=cloud_size[0], height=cloud_size[1], background_color="white"
+    )
     wordcloud.generate_from_frequencies(dict(freq_data))
     plt.figure(figsize=(10, 6))
     plt.imshow(wordcloud, interpolation="bilinear")
     plt.axis("off")
     plt.title(f"Word Cloud - {title_prefix}")
     plt.tight_layout()
-    plt.savefig(f"wordcloud_{file_prefix}.png", dpi=300)
+    plt.savefig(f"wordcloud_{file_prefix}.{cloud_format}", dpi=dpi)
     plt.show()
 
 
-def keyword_analysis(df: pd.DataFrame, output_path="data/articles_top_keywords.csv"):
+def chart_is_current(path, key):
+    """The chart file exists and its .hash sidecar holds the same key."""
+    try:
+        with open(f"{path}.hash", "r") as f:
+            return os.path.exists(path) and f.read() == key
+    except OSError:
+        return False
+
+
+def save_figure(fig, path, key, dpi):
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    with open(f"{path}.hash", "w") as f:
+        f.write(key)
+
+
+def chart_key(freq_data, *settings):
+    data = [(str(word), float(score)) for word, score in freq_data]
+    return hashlib.sha256(json.dumps([data, settings]).encode("utf-8")).hexdigest()
+
+
+def render_charts(
+    freq_data,
+    title_prefix,
+    score_label,
+    file_prefix,
+    dpi=300,
+    bar_format="png",
+    cloud_format="png",
+    cloud_size=(800, 400),
+):
+    """Headless version of plot_and_save, returns the paths of the redrawn charts."""
+    freq_data = list(freq_data)
+    written = []
+
+    # Bar Chart
+    bar_path = f"top20_{file_prefix}_bar.{bar_format}"
+    key = chart_key(freq_data[:20], title_prefix, score_label, dpi)
+    if not chart_is_current(bar_path, key):
+        words, scores = zip(*freq_data[:20])
+        fig = Figure(figsize=(10, 5))
+        ax = fig.subplots()
+        ax.barh(words[::-1], scores[::-1])
+        ax.set_title(f"Top 20 {title_prefix} Words")
+        ax.set_xlabel(score_label)
+        ax.set_ylabel("Word")
+        save_figure(fig, bar_path, key, dpi)
+        written.append(bar_path)
+
+    # Word Cloud
+    cloud_path = f"wordcloud_{file_prefix}.{cloud_format}"
+    key = chart_key(freq_data, title_prefix, dpi, list(cloud_size))
+    if not chart_is_current(cloud_path, key):
+        wordcloud = WordCloud(
+            width=cloud_size[0], height=cloud_size[1], background_color="white"
+        )
+        wordcloud.generate_from_frequencies(dict(freq_data))
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        ax.imshow(wordcloud, interpolation="bilinear")
+        ax.axis("off")
+        ax.set_title(f"Word Cloud - {title_prefix}")
+        save_figure(fig, cloud_path, key, dpi)
+        written.append(cloud_path)
+    return written
+
+
+def keyword_analysis(
+    df: pd.DataFrame,
+    output_path="data/articles_top_keywords.csv",
+    show=True,
+    **plot_options,
+):
     """
     Extract top keywords using both CountVectorizer and TF-IDF,
-    visualize results in bar charts and word clouds
+    visualize results in bar charts and word clouds.
+    With show=False both figure sets are rendered headless, in parallel processes;
+    plot_options (dpi, bar_format, cloud_format, cloud_size) go to plot_and_save.
     """
 
-    # CountVectorizer
-    cv = CountVectorizer(max_features=2000)
-    word_count = cv.fit_transform(df["clean_text"])
-    sum_words = word_count.sum(axis=0)
+    # CountVectorizer (counted once, cached while clean_text is unchanged)
+    word_count, feature_names = load_counts(df["clean_text"], max_features=2000)
+    sum_words = np.asarray(word_count.sum(axis=0)).flatten()
     words_freq = sorted(
-        [(word, sum_words[0, idx]) for word, idx in cv.vocabulary_.items()],
-        key=lambda x: x[1],
-        reverse=True,
+        list(zip(feature_names, sum_words)), key=lambda x: x[1], reverse=True
     )
-    plot_and_save(words_freq, "CountVectorizer (Frequency)", "Count", "countvectorizer")
 
-    # TF-IDF
-    tfidf = TfidfVectorizer(max_features=2000)
-    tfidf_matrix = tfidf.fit_transform(df["clean_text"])
+    # TF-IDF (derived from the counts)
+    tfidf_matrix = counts_to_tfidf(word_count)
     tfidf_scores = np.asarray(tfidf_matrix.sum(axis=0)).flatten()
-    tfidf_words = tfidf.get_feature_names_out()
+    tfidf_words = feature_names
     tfidf_freq = sorted(
         list(zip(tfidf_words, tfidf_scores)), key=lambda x: x[1], reverse=True
     )
-    plot_and_save(tfidf_freq, "TF-IDF (Importance)", "TF-IDF Score", "tfidf")
 
-    # Top TF-IDF keywords per article
-    def extract_top_tfidf(row, feature_names, matrix, top_n=5):
-        row_data = matrix[row].toarray().flatten()
-        top_indices = row_data.argsort()[-top_n:][::-1]
-        return ", ".join([feature_names[i] for i in top_indices if row_data[i] > 0])
-
-    df["top_keywords"] = [
-        extract_top_tfidf(i, tfidf_words, tfidf_matrix)
-        for i in range(tfidf_matrix.shape[0])
+    figure_sets = [
+        (words_freq, "CountVectorizer (Frequency)", "Count", "countvectorizer"),
+        (tfidf_freq, "TF-IDF (Importance)", "TF-IDF Score", "tfidf"),
     ]
+    if show:
+        for args in figure_sets:
+            plot_and_save(*args, **plot_options)
+    else:
+        with ProcessPoolExecutor(len(figure_sets)) as pool:
+            futures = [
+                pool.submit(render_charts, *args, **plot_options) for args in figure_sets
+            ]
+            written = [path for future in futures for path in future.result()]
+        print(f"Charts redrawn: {written or 'none (unchanged)'}")
+
+    # Top TF-IDF keywords per article
+    df["top_keywords"] = top_terms_per_row(tfidf_matrix, tfidf_words, k=5)
 
     # Save
-    df.to_csv(output_path, index=False)
+    save_table(df, output_path)
     print(f"\n Keyword extraction complete! Saved to {output_path}")
 
 
+def benchmark_top_keywords(
+    n_rows: int = 100_000, n_features: int = 50_000, density: float = 0.002, k: int = 5
+):
+    """
+    time the vectorized top-k against the old per-row toarray() + argsort on a
+    random csr matrix; the old version runs on a sample of rows and is extrapolated
+    """
+    import time
+    import scipy.sparse as sp
+
+    matrix = sp.random(
+        n_rows, n_features, density=density, format="csr", random_state=np.random.default_rng(0)
+    )
+    vocabulary = np.array([f"term{i}" for i in range(n_features)], dtype=object)
+    print(f"{n_rows} x {n_features}, {matrix.nnz} non-zeros")
+
+    begin_t = time.perf_counter()
+    top_terms_per_row(matrix, vocabulary, k)
+    after = time.perf_counter() - begin_t
+
+    sample = min(n_rows, 1000)
+    begin_t = time.perf_counter()
+    for row in range(sample):
+        row_data = matrix[row].toarray().flatten()
+        top_indices = row_data.argsort()[-k:][::-1]
+        ", ".join([vocabulary[i] for i in top_indices if row_data[i] > 0])
+    before = (time.perf_counter() - begin_t) * n_rows / sample
+
+    print(f"before: {before:8.2f}s (estimated from {sample} rows)")
+    print(f"after:  {after:8.2f}s  (x{before / after:.0f})")
+
+
 # Testing
-# data = pd.read_csv("data/filtered_articles.csv")
+# from corpus_store import load_table
+# data = load_table("data/filtered_articles.csv")
 # keyword_analysis(data)
+# benchmark_top_keywords()
+# keyword_analysis(data, show=False, dpi=100, bar_format="svg")
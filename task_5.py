@@ -1,24 +1,15 @@
 import pandas as pd
-import nltk
 import matplotlib.pyplot as plt
-import numpy as np
-from collections import Counter
-from nltk.tokenize import word_tokenize
+from term_index import load_index
 
-nltk.download("punkt_tab")
 
-
-def zipf_analysis(df: pd.DataFrame, print_stats: bool = True):
-    """Perform Zipf’s Law analysis and visualize rank-frequency relationship."""
-    corpus = " ".join(df["clean_text"].astype(str))
-    tokens = word_tokenize(corpus.lower())
-    tokens = [t for t in tokens if t.isalpha()]
-
-    freq_dist = Counter(tokens)
-    ranks = range(1, len(freq_dist) + 1)
-    frequencies = [freq for word, freq in freq_dist.most_common()]
-
-    expected_freqs = [frequencies[0] / rank for rank in ranks]
+def zipf_analysis(df: pd.DataFrame, print_stats: bool = True, index=None):
+    """Perform Zipf’s Law analysis and visualize rank-frequency relationship.
+    The counts come from the term-frequency index of clean_text (built once and
+    reused while the texts are unchanged), or from an already loaded `index`."""
+    if index is None:
+        index = load_index(df["clean_text"])
+    ranks, frequencies, expected_freqs, slope = index.zipf()
 
     # Plot Rank vs Frequency on a log-log scale
     plt.figure(figsize=(8, 6))
@@ -33,9 +24,6 @@ def zipf_analysis(df: pd.DataFrame, print_stats: bool = True):
 
     # Fit a regression line on log-transformed data to estimate slope
     if print_stats:
-        log_ranks = np.log(ranks)
-        log_freqs = np.log(frequencies)
-        slope, _ = np.polyfit(log_ranks, log_freqs, 1)
         print(f"Estimated Zipf slope: {slope:.2f}")
         if -1.3 < slope < -0.7:
             print("Corpus roughly follows Zipf’s Law.")
@@ -43,5 +31,6 @@ def zipf_analysis(df: pd.DataFrame, print_stats: bool = True):
             print("Corpus deviates from Zipf’s Law.")
 
 # Testing
-# data = pd.read_csv("data/filtered_articles.csv")
+# from corpus_store import load_table
+# data = load_table("data/filtered_articles.csv", columns=["clean_text"])
 # zipf_analysis(data)
@@ -1,65 +1,149 @@
 import pandas as pd
 import spacy
-from textstat import flesch_reading_ease, gunning_fog
+from functools import cached_property
 from nltk.tokenize import word_tokenize, sent_tokenize
 import nltk
+from corpus_encoding import load_encoding
+from lexical_diversity import diversity_from_encoding
+from readability import readability
 
 nltk.download('punkt')
 
 nlp = spacy.load("en_core_web_sm")
 
+# Lexical density only needs token.pos_ (tagger + attribute_ruler) and token.is_alpha
+LEXICAL_DISABLE = [name for name in ("parser", "ner", "lemmatizer") if name in nlp.pipe_names]
+
 # Functions
 
+class DocumentAnalysis:
+    """Tokens, sentences and the spaCy doc of one article, each computed once on
+    first use and shared by all metrics. With the corpus encoding and the article's
+    position in it, word and sentence counts are read from the encoding instead of
+    tokenizing again (its tokens are exactly those of word_tokenize)."""
+
+    def __init__(self, text, window_size=100, doc=None, encoding=None, position=None):
+        self.text = text
+        self.window_size = window_size
+        self.encoding = encoding
+        self.position = position
+        if doc is not None:
+            self.doc = doc
+
+    @cached_property
+    def sentences(self):
+        return sent_tokenize(self.text)
+
+    @cached_property
+    def tokens(self):
+        # same as word_tokenize(text), reusing the sentence split
+        return [
+            token
+            for sentence in self.sentences
+            for token in word_tokenize(sentence, preserve_line=True)
+        ]
+
+    @cached_property
+    def alpha_tokens(self):
+        """Lower-cased alphabetic tokens, as TTR/MSTTR count them."""
+        return [t for t in word_tokenize(self.text.lower()) if t.isalpha()]
+
+    @cached_property
+    def doc(self):
+        return nlp(self.text, disable=LEXICAL_DISABLE)
+
+    def ttr(self):
+        tokens = self.alpha_tokens
+        return (len(set(tokens)) / len(tokens)) * 100 if len(tokens) > 0 else 0
+
+    def msttr(self):
+        tokens = self.alpha_tokens
+        window_size = self.window_size
+        if len(tokens) < window_size:
+            return self.ttr()
+
+        ttrs = [
+            len(set(tokens[i : i + window_size])) / window_size
+            for i in range(0, len(tokens) - window_size + 1, window_size)
+        ]
+        return (sum(ttrs) / len(ttrs)) * 100 if ttrs else self.ttr()
+
+    def lexical_density(self):
+        return doc_lexical_density(self.doc)
+
+    def word_count(self):
+        if self.encoding is not None:
+            return self.encoding.token_count(self.position)
+        return len(self.tokens)
+
+    def sentence_count(self):
+        if self.encoding is not None:
+            return self.encoding.sentence_count(self.position)
+        return len(self.sentences)
+
+    @cached_property
+    def readability(self):
+        """Flesch reading ease and Gunning fog (as textstat) from one pass."""
+        return readability(self.text)
+
+    def avg_sentence_length(self):
+        return self.word_count() / self.sentence_count()
+
+
+def doc_lexical_density(doc):
+    content_words = [token for token in doc
+                     if token.pos_ in ['NOUN', 'VERB', 'ADJ', 'ADV']
+                     and token.is_alpha]
+    total_words = [token for token in doc if token.is_alpha]
+    return (len(content_words) / len(total_words)) * 100 if len(total_words) > 0 else 0
+
+
+def iter_docs(texts, batch_size=64, n_process=1):
+    """spaCy docs of many texts through nlp.pipe, tagging only."""
+    texts = (text if isinstance(text, str) else "" for text in texts)
+    return nlp.pipe(
+        texts, batch_size=batch_size, n_process=n_process, disable=LEXICAL_DISABLE
+    )
+
+
+def lexical_density_batch(texts, batch_size=64, n_process=1):
+    """Lexical density of every text, batched through nlp.pipe; n_process > 1
+    tags on several cores."""
+    return [doc_lexical_density(doc) for doc in iter_docs(texts, batch_size, n_process)]
+
+
 def calculate_ttr(text):
     """TTR"""
-    tokens = word_tokenize(text.lower())
-    tokens = [t for t in tokens if t.isalpha()]
-    types = set(tokens)
-    return (len(types) / len(tokens)) * 100 if len(tokens) > 0 else 0
+    return DocumentAnalysis(text).ttr()
 
 def calculate_msttr(text, window_size=100):
     """MSTTR"""
-    tokens = word_tokenize(text.lower())
-    tokens = [t for t in tokens if t.isalpha()]
-
-    if len(tokens) < window_size:
-        return calculate_ttr(text)
-
-    ttrs = []
-    for i in range(0, len(tokens) - window_size + 1, window_size):
-        window = tokens[i:i+window_size]
-        if len(window) == window_size:
-            ttr = len(set(window)) / len(window)
-            ttrs.append(ttr)
-
-    return (sum(ttrs) / len(ttrs)) * 100 if ttrs else calculate_ttr(text)
+    return DocumentAnalysis(text, window_size).msttr()
 
 def calculate_lexical_density(text):
     """Lexical density with spaCy"""
-    doc = nlp(text)
-    content_words = [token for token in doc
-                     if token.pos_ in ['NOUN', 'VERB', 'ADJ', 'ADV']
-                     and token.is_alpha]
-    total_words = [token for token in doc if token.is_alpha]
+    return DocumentAnalysis(text).lexical_density()
 
-    return (len(content_words) / len(total_words)) * 100 if len(total_words) > 0 else 0
-
-def analyze_article_metrics(row):
+def analyze_article_metrics(row, spacy_doc=None, encoding=None, position=None):
     original_text = row['article_text']
 
     try:
+        doc = DocumentAnalysis(
+            original_text, doc=spacy_doc, encoding=encoding, position=position
+        )
+
         # Metrics
         metrics = {
             'article_id': row.name,
             'title': row['title'][:50],  
-            'ttr': calculate_ttr(original_text),
-            'msttr': calculate_msttr(original_text),
-            'lexical_density': calculate_lexical_density(original_text),
-            'flesch_reading_ease': flesch_reading_ease(original_text),
-            'gunning_fog': gunning_fog(original_text),
-            'word_count': len(word_tokenize(original_text)),
-            'sentence_count': len(sent_tokenize(original_text)),
-            'avg_sentence_length': len(word_tokenize(original_text)) / len(sent_tokenize(original_text))
+            'ttr': doc.ttr(),
+            'msttr': doc.msttr(),
+            'lexical_density': doc.lexical_density(),
+            'flesch_reading_ease': doc.readability['flesch_reading_ease'],
+            'gunning_fog': doc.readability['gunning_fog'],
+            'word_count': doc.word_count(),
+            'sentence_count': doc.sentence_count(),
+            'avg_sentence_length': doc.avg_sentence_length()
         }
 
         return metrics
@@ -68,10 +152,40 @@ def analyze_article_metrics(row):
         print(f"Error processing article {row.name}: {e}")
         return None
 
+def analyze_corpus_metrics(df, batch_size=64, n_process=1):
+    """Metrics of every article, with the spaCy docs tagged in batches and the
+    word and sentence counts taken from the corpus encoding."""
+    encoding = load_encoding(df['article_text'])
+    docs = iter_docs(df['article_text'], batch_size, n_process)
+    results = [
+        analyze_article_metrics(row, spacy_doc, encoding, position)
+        for position, ((_, row), spacy_doc) in enumerate(zip(df.iterrows(), docs))
+    ]
+    return pd.DataFrame([result for result in results if result is not None])
+
+
+def corpus_diversity(df, window_size=100):
+    """TTR, MSTTR and MATTR of every article in one vectorized pass over the
+    token ids of the corpus encoding. The tokens are lower-cased after tokenizing
+    instead of tokenized from the lower-cased text, so values can differ slightly
+    from DocumentAnalysis where punkt splits differently."""
+    encoding = load_encoding(df['article_text'])
+    metrics = diversity_from_encoding(encoding, window_size)
+    return pd.DataFrame(
+        {
+            'article_id': df.index,
+            'ttr': metrics['ttr'],
+            'msttr': metrics['msttr'],
+            'mattr': metrics['mattr'],
+        }
+    )
+
+
 # # Testing
 
 # # Load Dataframe
-# df = pd.read_csv(r".\data\articles.csv")  # We can change which DF - Its for testing
+# from corpus_store import load_table
+# df = load_table("data/articles.csv", columns=["title", "article_text"])  # We can change which DF - Its for testing
 
 # print(f"Total articles loaded: {len(df)}")
 
@@ -84,13 +198,8 @@ def analyze_article_metrics(row):
 
 # print("\nCalculating lexical metrics...")
 
-# lexical_results = []
-# for idx, row in df.iterrows():
-#     result = analyze_article_metrics(row)
-#     if result is not None:
-#         lexical_results.append(result)
-
-# lexical_df = pd.DataFrame(lexical_results)
+# lexical_df = analyze_corpus_metrics(df, batch_size=64, n_process=1)
+# diversity_df = corpus_diversity(df)
 
 # ##Results
 
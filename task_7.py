@@ -135,7 +135,10 @@ def comprehensive_analysis(df):
 # Testing
 
 # # Load DataFrame
-# df = pd.read_csv(r".\data\cleaned_data.csv")
+# from corpus_store import load_table, save_table
+# df = load_table(
+#     "data/cleaned_data.csv", columns=["title", "date", "source", "clean_text"]
+# )
 # print(f"\nLoaded {len(df)} articles")
 
 
@@ -144,7 +147,7 @@ def comprehensive_analysis(df):
 # sentiment_df = comprehensive_analysis(df)
 
 # # Saved
-# sentiment_df.to_csv(r".\data\sentiment_emotion_analysis.csv", index=False)
+# save_table(sentiment_df, "data/sentiment_emotion_analysis.csv")
 # print(f"Results saved to 'sentiment_emotion_analysis.csv'")
 
 # # Statistics
@@ -1,13 +1,11 @@
-import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 from nltk.tokenize import word_tokenize, sent_tokenize
 from nltk.tag import pos_tag
-from task_2 import penn_to_wn_tag
 from task_8 import raw_entities, damage_sentences
 import csv
 import os
+from corpus_store import csv_to_store
 
-wnl = nltk.WordNetLemmatizer()
 sid = SentimentIntensityAnalyzer()
 
 
@@ -62,7 +60,7 @@ def impact_score(emo_intensity: dict, senti_polarity: float, dam_freq: float):
 def impact2csv(in_data: list[list[str]], out_path: str = "data/scored_articles.csv"):
     """
     take input data from csv file, compute impact score for each article
-    save to a new file with impact scores
+    save to a new file with impact scores, and update the corpus store from it
     """
     file_exists = os.path.isfile(out_path) and os.path.getsize(out_path) > 0
     out_fields = [
@@ -95,6 +93,7 @@ def impact2csv(in_data: list[list[str]], out_path: str = "data/scored_articles.c
         if not file_exists:
             csvwriter.writerow(out_fields)
         csvwriter.writerows(sorted_data)
+    csv_to_store(out_path)
     return sorted_data
 
 
@@ -0,0 +1,136 @@
+"""
+persisted term-frequency index of the clean_text column.
+
+clean_text is already lower-cased, alphabetic and separated by single spaces, so the
+index is built with str.split() and no tokenizer. it holds the vocabulary in
+decreasing order of corpus frequency (ties in order of first occurrence, as
+Counter.most_common), the corpus counts, and one sparse count vector per article.
+with the vocabulary in rank order the zipf rank-frequency arrays are the stored
+counts as they are, and the per-article curves are the sorted rows of the matrix.
+
+load_index(texts) hashes the texts to find their index; with the hash of an earlier
+load (index.input_hash) read_index(key) opens it without the texts.
+
+example:
+index = load_index(df["clean_text"])
+ranks, freqs, expected, slope = index.zipf()
+index = read_index(index.input_hash)
+"""
+
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from count_matrix import prune_cache_dirs, texts_hash
+
+DEFAULT_INDEX_DIR = "data/term_index"
+
+
+class TermFrequencyIndex:
+    def __init__(self, vocabulary, doc_counts, input_hash: str = None):
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.doc_counts = doc_counts.tocsr()
+        self.corpus_counts = np.asarray(self.doc_counts.sum(axis=0)).ravel()
+        self.input_hash = input_hash
+
+    @classmethod
+    def build(cls, texts, input_hash: str = None):
+        ids = {}
+        indices, indptr = [], [0]
+        for text in texts:
+            for word in str(text).split():
+                indices.append(ids.setdefault(word, len(ids)))
+            indptr.append(len(indices))
+        indices = np.asarray(indices, dtype=np.int64)
+        data = np.ones(len(indices), dtype=np.int64)
+        counts = sp.csr_matrix(
+            (data, indices, np.asarray(indptr)), shape=(len(indptr) - 1, len(ids))
+        )
+        counts.sum_duplicates()
+
+        # columns in rank order; a stable sort keeps first-occurrence order for ties
+        totals = np.asarray(counts.sum(axis=0)).ravel()
+        order = np.argsort(-totals, kind="stable")
+        vocabulary = np.array(list(ids), dtype=object)[order]
+        return cls(vocabulary, counts[:, order], input_hash)
+
+    def save(self, index_dir: str):
+        """
+        counts first, vocabulary (with the input hash) last, both through temp files
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        npz_path = os.path.join(index_dir, "doc_counts.npz")
+        vocab_path = os.path.join(index_dir, "vocabulary.json")
+        sp.save_npz(f"{npz_path}.tmp.npz", self.doc_counts)
+        os.replace(f"{npz_path}.tmp.npz", npz_path)
+        with open(f"{vocab_path}.tmp", "w") as f:
+            json.dump(
+                {"input_hash": self.input_hash, "vocabulary": list(self.vocabulary)}, f
+            )
+        os.replace(f"{vocab_path}.tmp", vocab_path)
+
+    @classmethod
+    def load(cls, index_dir: str):
+        """
+        the saved index, or None
+        """
+        try:
+            with open(os.path.join(index_dir, "vocabulary.json"), "r") as f:
+                meta = json.load(f)
+            counts = sp.load_npz(os.path.join(index_dir, "doc_counts.npz"))
+        except (OSError, ValueError, KeyError):
+            return None
+        if counts.shape[1] != len(meta["vocabulary"]):
+            return None
+        return cls(meta["vocabulary"], counts, meta["input_hash"])
+
+    def zipf(self):
+        """
+        ranks, corpus frequencies, the ideal zipf curve f(1) / rank and the slope of
+        a linear fit in log-log space
+        """
+        freqs = self.corpus_counts
+        ranks = np.arange(1, len(freqs) + 1)
+        expected = freqs[0] / ranks
+        slope, _ = np.polyfit(np.log(ranks), np.log(freqs), 1)
+        return ranks, freqs, expected, slope
+
+    def doc_rank_frequencies(self, i: int):
+        """
+        ranks and relative frequencies of the terms of one article
+        """
+        indptr = self.doc_counts.indptr
+        row = self.doc_counts.data[indptr[i] : indptr[i + 1]]
+        freqs = np.sort(row)[::-1] / row.sum()
+        return np.arange(1, len(freqs) + 1), freqs
+
+
+def read_index(key: str, root: str = DEFAULT_INDEX_DIR):
+    """
+    the saved index of the texts with hash `key`, or None, without rehashing them
+    """
+    index_dir = os.path.join(root, key[:16])
+    index = TermFrequencyIndex.load(index_dir)
+    if index is None or index.input_hash != key:
+        return None
+    os.utime(index_dir)
+    return index
+
+
+def load_index(texts, root: str = DEFAULT_INDEX_DIR, keep: int = 4):
+    """
+    the saved index of the same texts, otherwise build and save it. indexes live in
+    <root>/<input hash>/ so the stages reading different tables (e.g. cleaned_data
+    and filtered_articles) don't overwrite each other; only the `keep` most recently
+    used are kept.
+    """
+    texts = list(texts)
+    key = texts_hash(texts)
+    index = read_index(key, root)
+    if index is None:
+        index = TermFrequencyIndex.build(texts, key)
+        index.save(os.path.join(root, key[:16]))
+    prune_cache_dirs(root, keep)
+    return index